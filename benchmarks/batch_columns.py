@@ -0,0 +1,127 @@
+"""
+Batch Column Injection Benchmark
+
+Adds the same constant columns (snapshot_week_start, source_database and a
+per-batch load timestamp) to a synthetic resource in three ways and reports
+rows/sec of extraction:
+- row_map: add_map with a per-row function on row dicts (sqlalchemy backend)
+- row_batch: add_columns on row dicts, one step call per batch
+- arrow_batch: add_columns on Arrow batches (pyarrow/connectorx backends)
+
+It also runs the date sanitizer of source_table both ways on row dicts:
+- sanitize_row_map: add_map, one call per row (the former source_table step)
+- sanitize_batch: MapBatch, one call per batch (the current one)
+
+No database is needed; batches are generated in memory before timing, so
+only the column step and dlt's pipe overhead are measured.
+
+Usage (from the repository root):
+    python -m benchmarks.batch_columns
+    python -m benchmarks.batch_columns --rows 2000000 --chunk-size 100000
+"""
+
+import argparse
+import datetime
+import time
+
+import dlt
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import BigInteger, Column, Date, DateTime, MetaData, Table
+
+from flows.batch_columns import MapBatch, add_columns
+from flows.sanitize import make_sanitizer
+
+SNAPSHOT_WEEK_START = datetime.date(2026, 1, 4)
+COLUMNS = {
+    "snapshot_week_start": SNAPSHOT_WEEK_START,
+    "source_database": "tn",
+    "loaded_at": lambda: datetime.datetime.now(datetime.timezone.utc),
+}
+
+
+def make_arrow_batches(rows: int, chunk_size: int) -> list[pa.Table]:
+    """Build Arrow batches shaped like sched_template_shift_assignments."""
+    batches = []
+    for start in range(0, rows, chunk_size):
+        ids = pa.array(range(start, min(start + chunk_size, rows)), pa.int64())
+        batches.append(pa.table({
+            "id": ids,
+            "user_id": pc.remainder(ids, 900),
+            "cost_center_id": pc.remainder(ids, 40),
+            "date_line": pa.array([datetime.date(2026, 1, 4)] * len(ids)),
+            "start_time": pa.array([datetime.datetime(2026, 1, 4, 7)] * len(ids)),
+            "end_time": pa.array([datetime.datetime(2026, 1, 4, 19)] * len(ids)),
+        }))
+    return batches
+
+
+def run(name: str, batches: list, add) -> float:
+    """Extract the batches through a resource with the given column step, return seconds."""
+    @dlt.resource(name=name)
+    def synthetic():
+        yield from batches
+
+    resource = add(synthetic())
+    started = time.perf_counter()
+    for _ in resource:
+        pass
+    return time.perf_counter() - started
+
+
+def add_row_map(resource):
+    def add_snapshot_columns(row):
+        row["snapshot_week_start"] = SNAPSHOT_WEEK_START
+        row["source_database"] = "tn"
+        row["loaded_at"] = datetime.datetime.now(datetime.timezone.utc)
+        return row
+    return resource.add_map(add_snapshot_columns)
+
+
+def make_sanitize_steps():
+    """Return the per-row and per-batch sanitizer steps for the synthetic rows."""
+    table = Table(
+        "sched_template_shift_assignments",
+        MetaData(),
+        Column("id", BigInteger),
+        Column("date_line", Date),
+        Column("start_time", DateTime),
+        Column("end_time", DateTime),
+    )
+    sanitizer = make_sanitizer(table)
+    return (
+        lambda resource: resource.add_map(sanitizer),
+        lambda resource: resource.add_step(MapBatch(sanitizer)),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    arrow_batches = make_arrow_batches(args.rows, args.chunk_size)
+    row_batches = [batch.to_pylist() for batch in arrow_batches]
+
+    sanitize_row_map, sanitize_batch = make_sanitize_steps()
+    cases = [
+        ("row_map", row_batches, add_row_map),
+        ("row_batch", row_batches, lambda resource: add_columns(resource, COLUMNS)),
+        ("arrow_batch", arrow_batches, lambda resource: add_columns(resource, COLUMNS)),
+        ("sanitize_row_map", row_batches, sanitize_row_map),
+        ("sanitize_batch", row_batches, sanitize_batch),
+    ]
+
+    print(f"{'mode':<18}{'rows':>12}{'seconds':>10}{'rows/s':>14}")
+    for name, batches, add in cases:
+        # Row dicts are mutated in place, so every case gets fresh copies
+        items = batches
+        if batches is row_batches:
+            items = [[dict(row) for row in batch] for batch in row_batches]
+        seconds = run(name, items, add)
+        print(f"{name:<18}{args.rows:>12,}{seconds:>10.2f}{args.rows / seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
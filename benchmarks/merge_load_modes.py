@@ -0,0 +1,123 @@
+"""
+Merge Load Mode Benchmark
+
+Merges the same synthetic dataset into the local Postgres from
+docker-compose.yml with each load mode in flows/pipelines.py and reports the
+normalize and load time of two merges per mode:
+- initial: every row is new, the destination table starts empty
+- remerge: every row already exists, so every row is updated
+
+The source is the synthetic cad_trip_legs_rev table from
+benchmarks/extraction_backends.py (primary key leg_id, rev). It is extracted
+once per mode with the pyarrow backend so the extraction cost stays small and
+identical between modes; only normalize (file writing) and load (staging
+plus merge SQL) differ. Each mode runs in its own subprocess.
+
+Usage (from the repository root):
+    docker compose up -d db
+    python -m benchmarks.merge_load_modes --rows 1000000
+    python -m benchmarks.merge_load_modes --skip-create --modes copy_upsert
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+import dlt
+from dlt.sources.sql_database import sql_table
+
+from benchmarks.extraction_backends import (
+    LOCAL_POSTGRES,
+    SOURCE_SCHEMA,
+    SOURCE_TABLE,
+    create_synthetic_table,
+)
+from flows.pipelines import LOAD_MODES, apply_load_mode
+
+
+def merge_once(pipeline: dlt.Pipeline, url: str, mode: str) -> dict:
+    """Extract the synthetic table and merge it, returning normalize/load timings."""
+    table = sql_table(
+        credentials=url,
+        schema=SOURCE_SCHEMA,
+        table=SOURCE_TABLE,
+        backend="pyarrow",
+        chunk_size=100000,
+    )
+    pipeline.extract(apply_load_mode(table, mode))
+    started = time.perf_counter()
+    pipeline.normalize()
+    normalized = time.perf_counter()
+    pipeline.load()
+    loaded = time.perf_counter()
+    return {"normalize_s": normalized - started, "load_s": loaded - normalized}
+
+
+def run_mode(url: str, mode: str) -> dict:
+    """Run an initial merge and a full re-merge with one load mode."""
+    pipelines_dir = tempfile.mkdtemp(prefix="bench_merge_")
+    dataset_name = f"bench_merge_{mode}"
+    pipeline = dlt.pipeline(
+        pipeline_name=dataset_name,
+        pipelines_dir=pipelines_dir,
+        destination=dlt.destinations.postgres(url),
+        dataset_name=dataset_name,
+    )
+    with pipeline.sql_client() as client:
+        if client.has_dataset():
+            client.drop_dataset()
+
+    initial = merge_once(pipeline, url, mode)
+    remerge = merge_once(pipeline, url, mode)
+
+    with pipeline.sql_client() as client:
+        rows = client.execute_sql(f"SELECT count(*) FROM {client.make_qualified_table_name(SOURCE_TABLE)}")[0][0]
+
+    return {"mode": mode, "rows": rows, "initial": initial, "remerge": remerge}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=LOCAL_POSTGRES, help="Local Postgres used as source and destination")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the synthetic table")
+    parser.add_argument("--modes", nargs="+", default=LOAD_MODES, choices=LOAD_MODES)
+    parser.add_argument("--skip-create", action="store_true", help="Reuse the existing synthetic table")
+    parser.add_argument("--run-mode", choices=LOAD_MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        print(json.dumps(run_mode(args.url, args.run_mode)))
+        return
+
+    if not args.skip_create:
+        print(f"Creating {args.rows:,} synthetic rows in {SOURCE_SCHEMA}.{SOURCE_TABLE}")
+        create_synthetic_table(args.url, args.rows)
+
+    print(f"{'mode':<15}{'merge':<9}{'rows':>12}{'rows/s':>12}{'normalize s':>13}{'load s':>9}")
+    for mode in args.modes:
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.merge_load_modes", "--url", args.url, "--run-mode", mode],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+            print(f"{mode:<15} failed: {error}")
+            continue
+
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        for merge in ("initial", "remerge"):
+            timings = stats[merge]
+            total = timings["normalize_s"] + timings["load_s"]
+            print(
+                f"{mode:<15}{merge:<9}{stats['rows']:>12,}{stats['rows'] / total:>12,.0f}"
+                f"{timings['normalize_s']:>13.1f}{timings['load_s']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
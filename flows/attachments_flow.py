@@ -1,90 +1,110 @@
-import time
 import datetime
 import dlt
-from dlt.sources.sql_database import sql_table
 from prefect import flow, task
 from prefect.logging import get_run_logger
 
+from flows.hash_diff import reconcile_deletes
+from flows.pipelines import get_pipeline, merge_hints
+from flows.registry import plan
+from flows.sources import get_recheck_window, source_table
+
+
+# First cursor value of the incremental attachment tables
+INITIAL_VALUE = datetime.datetime(2026, 1, 1, 0, 0, 0)
+
+# Keyset tables only see new ids, so deletes are reconciled this often with
+# key-only passes over the source and warehouse tables
+DELETE_RECONCILE_INTERVAL = datetime.timedelta(days=7)
+
+# Local pipeline state key holding the time of the last delete reconcile
+RECONCILE_STATE_KEY = "last_delete_reconcile"
+
+
+def attachment_table(source_name: str, spec):
+    """Create the incremental resource of one attachment table."""
+    if spec.is_keyset:
+        incremental = dlt.sources.incremental(
+            spec.cursor,
+            initial_value=0,
+            lag=get_recheck_window(spec.name),
+            row_order="asc",
+        )
+    else:
+        incremental = dlt.sources.incremental(spec.cursor, initial_value=INITIAL_VALUE)
+    return source_table(source_name, table=spec.name, incremental=incremental).apply_hints(
+        primary_key=list(spec.key),
+        write_disposition="merge",
+    )
+
+
+def reconcile_due(pipeline: dlt.Pipeline, now: datetime.datetime) -> bool:
+    """Whether DELETE_RECONCILE_INTERVAL has passed since the last delete reconcile."""
+    try:
+        last_reconcile = pipeline.get_local_state_val(RECONCILE_STATE_KEY)
+    except KeyError:
+        return True
+    return now - datetime.datetime.fromisoformat(last_reconcile) >= DELETE_RECONCILE_INTERVAL
+
 
 @task
 def load_attachments_pipeline(
         dataset_name: str,
-        source_name: str
+        source_name: str,
+        reconcile: bool | None = None,
 ) -> None:
     """
-    Incrementally load attachment-related tables.
+    Incrementally load attachment-related tables, as declared in flows/registry.py.
 
     - attachments: incremental on 'date' column
     - attachments_log: incremental on 'timestamp' column
-    - cad_trip_leg_attachments: links attachments to trip legs
-    - cad_trip_leg_attachment_types: links attachments to attachment types
-    """
-    logger = get_run_logger()
-    pipeline = dlt.pipeline(
-        pipeline_name=f"attachments_{dataset_name}_{int(time.time())}",
-        destination='postgres',
-        dataset_name=dataset_name,
-    )
+    - cad_trip_leg_attachments: links attachments to trip legs, keyset on id
+    - cad_trip_leg_attachment_types: links attachments to attachment types,
+      keyset on trip_leg_attachment_id
 
-    # attachments table - incremental on 'date'
-    attachments = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="attachments",
-    )
-    attachments.apply_hints(
-        primary_key="id",
-        write_disposition="merge",
-        incremental=dlt.sources.incremental(
-            "date",
-            initial_value=datetime.datetime(2026, 1, 1, 0, 0, 0)
-        ),
-    )
+    The link tables only read ids past the previous run's cursor, minus their
+    re-check window, so they cannot see deleted links. Those are found by a
+    key-only reconcile (flows/hash_diff.py) and hard deleted.
 
-    # attachments_log table - incremental on 'timestamp'
-    attachments_log = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="attachments_log",
-    )
-    attachments_log.apply_hints(
-        primary_key="id",
-        write_disposition="merge",
-        incremental=dlt.sources.incremental(
-            "timestamp",
-            initial_value=datetime.datetime(2026, 1, 1, 0, 0, 0)
-        ),
-    )
+    Args:
+        dataset_name: Name of the dataset to load into
+        source_name: Name of the source configuration
+        reconcile: Reconcile link table deletes; None to reconcile when
+            DELETE_RECONCILE_INTERVAL has passed since the last reconcile
+    """
+    logger = get_run_logger()
+    pipeline = get_pipeline("attachments", dataset_name)
+    specs = plan("attachments")
 
-    # cad_trip_leg_attachments - links attachments to trip legs
-    leg_attachments = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="cad_trip_leg_attachments",
-    )
-    leg_attachments.apply_hints(
-        primary_key="id",
-        write_disposition="merge",
-    )
+    info = pipeline.run(merge_hints([attachment_table(source_name, spec) for spec in specs]))
+    logger.info(f"Finished loading attachments tables: {info}")
 
-    # cad_trip_leg_attachment_types - junction table (composite key: trip_leg_attachment_id, type_id)
-    leg_attachment_types = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="cad_trip_leg_attachment_types",
-    )
-    leg_attachment_types.apply_hints(
-        primary_key=["trip_leg_attachment_id", "type_id"],
-        write_disposition="merge",
-    )
+    now = datetime.datetime.now()
+    if reconcile is None:
+        reconcile = reconcile_due(pipeline, now)
+    if not reconcile:
+        return
 
-    info = pipeline.run([attachments, attachments_log, leg_attachments, leg_attachment_types])
-    logger.info(f"Finished loading attachments tables: {info}")
+    # Run separately, so delete rows never share a load with the keyset batches
+    deletes = []
+    for spec in specs:
+        if spec.is_keyset:
+            resources, deleted = reconcile_deletes(pipeline, source_name, spec.name, list(spec.key))
+            logger.info(f"{spec.name}: {deleted} deleted keys")
+            deletes.extend(resources)
+    if deletes:
+        info = pipeline.run(merge_hints(deletes))
+        logger.info(f"Finished reconciling attachment link deletes: {info}")
+    pipeline.set_local_state_val(RECONCILE_STATE_KEY, now.isoformat())
 
 
 @flow
 def load_attachments(
         dataset_name: str,
-        source_name: str
+        source_name: str,
+        reconcile: bool | None = None,
 ) -> None:
-    """Load attachments and attachments_log for a single database."""
-    load_attachments_pipeline(dataset_name, source_name)
+    """Load the attachment tables for a single database."""
+    load_attachments_pipeline(dataset_name, source_name, reconcile)
 
 
 if __name__ == "__main__":
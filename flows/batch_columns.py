@@ -0,0 +1,84 @@
+"""
+Batch-Level Column Injection
+
+add_map calls its function once per row whenever a resource yields a list
+of rows, which is the slow path for adding columns that are the same for a
+whole batch (snapshot keys, source_database, load timestamps).
+
+add_columns instead adds such columns with one step call per yielded item:
+- Arrow tables/batches (pyarrow, connectorx backends) get each column
+  appended as a single repeated array, with no per-row Python at all.
+- pandas DataFrames (pandas backend) get a vectorized column assignment.
+- Row lists (sqlalchemy backend) are updated in one loop over the batch.
+
+A column value is either a constant or a zero-argument callable evaluated
+once per batch, e.g. a load timestamp.
+
+MapBatch is the underlying step and takes any whole-item function: source_table
+in flows/sources.py runs the date sanitizer through it, and the hash-diff
+filter in flows/hash_diff.py drops unchanged rows with it.
+"""
+
+from typing import Any, Callable
+
+import pandas as pd
+import pyarrow as pa
+from dlt.extract.items_transform import ItemTransform
+
+
+class MapBatch(ItemTransform):
+    """Like add_map, but calls the function once per yielded item instead of per row."""
+
+    def __call__(self, item, meta: Any = None):
+        if self._f_meta:
+            return self._f_meta(item, meta)
+        return self._f(item)
+
+
+def _batch_values(columns: dict[str, Any]) -> dict[str, Any]:
+    """Evaluate callable column values for one batch."""
+    return {name: value() if callable(value) else value for name, value in columns.items()}
+
+
+def add_columns_arrow(item: pa.Table | pa.RecordBatch, values: dict[str, Any]):
+    """Append constant columns to an Arrow table or batch."""
+    for name, value in values.items():
+        scalar = value if isinstance(value, pa.Scalar) else pa.scalar(value)
+        column = pa.repeat(scalar, item.num_rows)
+        index = item.schema.get_field_index(name)
+        if index < 0:
+            item = item.append_column(name, column)
+        else:
+            item = item.set_column(index, name, column)
+    return item
+
+
+def make_column_adder(columns: dict[str, Any]) -> Callable[[Any], Any]:
+    """Build a batch function adding constant or per-batch computed columns."""
+    def add(item):
+        values = _batch_values(columns)
+        if isinstance(item, (pa.Table, pa.RecordBatch)):
+            return add_columns_arrow(item, values)
+        if isinstance(item, pd.DataFrame):
+            return item.assign(**values)
+        if isinstance(item, list):
+            for row in item:
+                row.update(values)
+            return item
+        if isinstance(item, dict):
+            item.update(values)
+        return item
+
+    return add
+
+
+def add_columns(resource, columns: dict[str, Any], insert_at: int | None = None):
+    """Add constant or per-batch computed columns to every item of a resource.
+
+    Args:
+        resource: dlt resource, e.g. from source_table
+        columns: Column name to constant value, or to a zero-argument callable
+            evaluated once per batch
+        insert_at: Pipe step to insert at, as for add_map; defaults to the end
+    """
+    return resource.add_step(MapBatch(make_column_adder(columns)), insert_at=insert_at)
@@ -3,31 +3,237 @@ BigQuery Export Flow
 
 Exports models from the dbt 'bigquery' schema in PostgreSQL to Google BigQuery.
 Runs every 4 hours to keep BigQuery data current for PowerBI consumption.
+
+Fact tables hold all history, so in incremental mode they only ship changed
+date partitions: the partitions from RECENT_PARTITION_DAYS before the last
+export (and all later ones), plus the service dates of bq_runs rows
+modified since the newest modified_timestamp already exported. Every shipped
+partition is replaced as a whole (delete-insert on the partition column), so
+rows removed from a partition are removed in BigQuery too. Small dimensions
+are replaced in full.
+
+Columns relative to the current date (e.g. days_from_today in bq_runs) are
+only recomputed for shipped partitions, so a nightly replace export keeps
+them current for the day.
+
+Tables are extracted as Arrow batches and written as compressed Parquet.
+With a staging bucket (bigquery_export.staging_url, e.g. gs://bucket/path)
+the files are staged under STAGING_LAYOUT and loaded by BigQuery load jobs
+from there, and kept for other consumers. Parquet files can only be split
+per table and load, so the region and date partitioning lives in BigQuery:
+partitioned tables are partitioned by date and clustered by region. The
+bytes written per table are logged after every export.
+
+Tables whose content did not change since their last full export are
+skipped. The bigquery models are tables rebuilt by every dbt build, so
+whether dbt ran them says nothing; instead a content fingerprint (row count
+and an order-independent sum of row hashes, computed in PostgreSQL) is
+compared with the one of the table's last full replace. Shipping changed
+partitions does not bring the whole table up to date, so those exports are
+recorded as partial and never make a table skippable; replace mode never
+skips. Every export and skip is recorded in the bigquery_export_manifest
+table of the warehouse.
 """
 
-import time
+import datetime
+from dataclasses import dataclass
 
 import dlt
-from dlt.sources.sql_database import sql_database
+from dlt.common.pipeline import LoadInfo
+from dlt.destinations import filesystem
+from dlt.destinations.adapters import bigquery_adapter
+from dlt.destinations.exceptions import DatabaseUndefinedRelation
+from dlt.sources.sql_database import sql_table
 from prefect import flow
 from prefect.logging import get_run_logger
+from sqlalchemy import MetaData, Table, select, text
+
+from flows.pipelines import exclusive_run, get_pipeline
+from flows.sources import get_engine
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    """How one bigquery schema table is exported."""
 
+    name: str
+    # Date column the table is partitioned and shipped by, None to replace
+    partition_column: str | None = None
+    # Whether partitions of changed bq_runs service dates are shipped too
+    follows_runs: bool = False
+
+
+EXPORT_TABLES = (
+    ExportTable("daily_dashboard", "date_of_service", follows_runs=True),
+    ExportTable("bq_users"),
+    ExportTable("bq_runs", "service_date", follows_runs=True),
+    ExportTable("bq_shifts", "shift_date"),
+    ExportTable("bq_attachment_compliance", "service_date", follows_runs=True),
+    ExportTable("v_daily_operations", "service_date", follows_runs=True),
+)
 
 # Tables in the bigquery schema to export
-BIGQUERY_TABLES = [
-    "daily_dashboard",
-    "bq_users",
-    "bq_runs",
-    "bq_shifts",
-    "bq_attachment_compliance",
-    "v_daily_operations"
-]
+BIGQUERY_TABLES = [table.name for table in EXPORT_TABLES]
+
+# The run changes that mark changed partitions: bq_runs rows past the newest
+# exported modified_timestamp
+RUNS_TABLE = "bq_runs"
+RUNS_DATE_COLUMN = "service_date"
+RUNS_MODIFIED_COLUMN = "modified_timestamp"
+
+# Partitions this many days before the last export (and all later ones) are
+# always shipped
+RECENT_PARTITION_DAYS = 7
+
+# Staged files per table and export date, e.g. bq_runs/2026-03-01/<load>.parquet
+STAGING_LAYOUT = "{table_name}/{YYYY}-{MM}-{DD}/{load_id}.{file_id}.{ext}"
+
+# Column the partitioned BigQuery tables are clustered by
+CLUSTER_COLUMN = "region"
+
+# Export decisions per table and run, in the warehouse
+MANIFEST_TABLE = "bigquery_export_manifest"
+MANIFEST_DATASET = "export_manifest"
+
+# Export modes:
+# - incremental: replace changed partitions of fact tables, dimensions in full
+# - replace: replace every table in full
+EXPORT_MODES = ["incremental", "replace"]
+
+
+def get_exported_watermark(pipeline: dlt.Pipeline, table_name: str, column: str):
+    """Return the newest value of a column in an exported table, None if not exported yet."""
+    try:
+        with pipeline.sql_client() as client:
+            table = client.make_qualified_table_name(table_name)
+            rows = client.execute_sql(f"SELECT MAX({client.escape_column_name(column)}) FROM {table}")
+    except DatabaseUndefinedRelation:
+        return None
+    return rows[0][0] if rows else None
+
+
+def get_last_export_date(pipeline: dlt.Pipeline) -> datetime.date | None:
+    """Return the date of the last completed export, None if there was none.
+
+    Arrow rows carry no _dlt_load_id, so this is read from the _dlt_loads
+    table; every export loads all tables in one package.
+    """
+    last_load_id = get_exported_watermark(pipeline, "_dlt_loads", "load_id")
+    if last_load_id is None:
+        return None
+    # Load ids are the unix timestamp of the load
+    return datetime.datetime.fromtimestamp(float(last_load_id)).date()
+
+
+def get_changed_run_dates(postgres_schema: str, modified_since) -> list[datetime.date]:
+    """Return the service dates of bq_runs rows modified after modified_since."""
+    engine = get_engine("local_postgres")
+    table = Table(RUNS_TABLE, MetaData(schema=postgres_schema), autoload_with=engine)
+    query = select(table.c[RUNS_DATE_COLUMN]).distinct().where(
+        (table.c[RUNS_MODIFIED_COLUMN] > modified_since) & table.c[RUNS_DATE_COLUMN].isnot(None)
+    )
+    with engine.connect() as connection:
+        return [row[0] for row in connection.execute(query)]
+
+
+def create_partition_filter(column: str, first_recent: datetime.date, changed_dates: list[datetime.date]):
+    """Create a query adapter selecting the recent and changed partitions."""
+    def filter_partitions(query, table):
+        condition = table.c[column] >= first_recent
+        if changed_dates:
+            condition = condition | table.c[column].in_(changed_dates)
+        return query.where(condition)
+    return filter_partitions
+
+
+def export_resource(
+    spec: ExportTable,
+    postgres_schema: str,
+    destination: str,
+    query_adapter_callback=None,
+):
+    """Create the resource of one exported table, replaced in full without a filter."""
+    resource = sql_table(
+        credentials=get_engine("local_postgres"),
+        schema=postgres_schema,
+        table=spec.name,
+        query_adapter_callback=query_adapter_callback,
+        backend="pyarrow",
+    )
+    if query_adapter_callback is None:
+        resource.apply_hints(write_disposition="replace")
+    else:
+        resource.apply_hints(
+            write_disposition={"disposition": "merge", "strategy": "delete-insert"},
+            merge_key=spec.partition_column,
+        )
+    if spec.partition_column and destination == "bigquery":
+        # Only applies when the table is created; drop an existing
+        # unpartitioned table once to have it recreated partitioned
+        bigquery_adapter(resource, partition=spec.partition_column, cluster=[CLUSTER_COLUMN])
+    return resource
+
+
+def get_fingerprint(postgres_schema: str, table_name: str) -> str:
+    """Fingerprint the content of a bigquery schema table.
+
+    Row count plus the sum of the first 60 bits of every row's md5, so the
+    fingerprint does not depend on row order and needs a single scan.
+    """
+    engine = get_engine("local_postgres")
+    quote = engine.dialect.identifier_preparer.quote
+    query = text(
+        "SELECT count(*), coalesce(sum(('x' || substr(md5(t::text), 1, 15))::bit(60)::bigint), 0) "
+        f"FROM {quote(postgres_schema)}.{quote(table_name)} t"
+    )
+    with engine.connect() as connection:
+        row_count, hash_sum = connection.execute(query).one()
+    return f"{row_count}:{hash_sum}"
+
+
+def get_exported_fingerprints(manifest_pipeline: dlt.Pipeline, bigquery_dataset: str) -> dict[str, str]:
+    """Return the fingerprint of every table's last full export to a BigQuery dataset."""
+    try:
+        with manifest_pipeline.sql_client() as client:
+            table = client.make_qualified_table_name(MANIFEST_TABLE)
+            rows = client.execute_sql(
+                f"SELECT DISTINCT ON (table_name) table_name, fingerprint FROM {table} "
+                f"WHERE bigquery_dataset = %s AND status = 'exported' "
+                f"ORDER BY table_name, exported_at DESC",
+                bigquery_dataset,
+            )
+    except DatabaseUndefinedRelation:
+        return {}
+    return dict(rows or [])
+
+
+def get_manifest_status(table_name: str, skipped: list[str], replaced: set[str]) -> str:
+    """Return how a table was exported: skipped, exported (in full) or partial."""
+    if table_name in skipped:
+        return "skipped"
+    return "exported" if table_name in replaced else "partial"
+
+
+def get_file_bytes(info: LoadInfo) -> dict[str, int]:
+    """Sum the bytes of the files written per table in a load."""
+    file_bytes = {}
+    for package in info.load_packages:
+        for job in package.jobs["completed_jobs"]:
+            table_name = job.job_file_info.table_name
+            if not table_name.startswith("_dlt"):
+                file_bytes[table_name] = file_bytes.get(table_name, 0) + job.file_size
+    return file_bytes
 
 
 @flow
 def export_to_bigquery(
     postgres_schema: str = "bigquery",
     bigquery_dataset: str = "lan_analytics",
+    mode: str = "incremental",
+    recent_days: int = RECENT_PARTITION_DAYS,
+    destination: str = "bigquery",
+    staging_url: str | None = None,
+    skip_unchanged: bool = True,
 ) -> None:
     """
     Export tables from PostgreSQL bigquery schema to Google BigQuery.
@@ -36,35 +242,111 @@ def export_to_bigquery(
         postgres_schema: The PostgreSQL schema containing the dbt bigquery models
                         (dbt prefixes schema names with the database name)
         bigquery_dataset: The BigQuery dataset to write to
+        mode: Export mode, see EXPORT_MODES
+        recent_days: Partitions this many days before the last export are always shipped
+        destination: dlt destination, e.g. duckdb to test the export locally
+        staging_url: Bucket or directory to stage the Parquet files in,
+                     defaults to bigquery_export.staging_url; None loads
+                     the files directly
+        skip_unchanged: Skip tables whose fingerprint matches their last full
+                        export; always off in replace mode, which is what
+                        brings every table back in line
     """
+    if mode not in EXPORT_MODES:
+        raise ValueError(f"Unknown export mode '{mode}', expected one of {EXPORT_MODES}")
+
     logger = get_run_logger()
 
-    logger.info(f"Starting BigQuery export from {postgres_schema} to {bigquery_dataset}")
+    logger.info(f"Starting {mode} BigQuery export from {postgres_schema} to {bigquery_dataset}")
 
-    # Create pipeline with BigQuery destination
-    pipeline = dlt.pipeline(
-        pipeline_name=f"bigquery_export_{int(time.time())}",
-        destination="bigquery",
-        dataset_name=bigquery_dataset,
-    )
+    staging_url = staging_url or dlt.config.get("bigquery_export.staging_url", str)
+    staging = filesystem(bucket_url=staging_url, layout=STAGING_LAYOUT) if staging_url else None
+    pipeline = get_pipeline("bigquery_export", bigquery_dataset, destination=destination, staging=staging)
 
-    # Source from local PostgreSQL (the dbt output database)
-    source = sql_database(
-        credentials=dlt.secrets["sources.local_postgres.credentials"],
-        schema=postgres_schema,
-        table_names=BIGQUERY_TABLES,
-    )
+    manifest_pipeline = get_pipeline("bigquery_export_manifest", MANIFEST_DATASET)
+    skip_unchanged = skip_unchanged and mode != "replace"
+    exported_fingerprints = get_exported_fingerprints(manifest_pipeline, bigquery_dataset) if skip_unchanged else {}
+    fingerprints = {spec.name: get_fingerprint(postgres_schema, spec.name) for spec in EXPORT_TABLES}
+    export_tables = [
+        spec for spec in EXPORT_TABLES
+        if exported_fingerprints.get(spec.name) != fingerprints[spec.name]
+    ]
+    skipped = [spec.name for spec in EXPORT_TABLES if spec not in export_tables]
+    if skipped:
+        logger.info(f"Skipping tables unchanged since their last full export: {skipped}")
 
-    # Run the pipeline - replace tables each time for clean data
-    info = pipeline.run(source, write_disposition="replace")
+    changed_dates = []
+    if mode == "incremental":
+        runs_watermark = get_exported_watermark(pipeline, RUNS_TABLE, RUNS_MODIFIED_COLUMN)
+        if runs_watermark is not None:
+            changed_dates = get_changed_run_dates(postgres_schema, runs_watermark)
+            logger.info(f"{len(changed_dates)} service dates with runs modified since {runs_watermark}")
 
-    logger.info(f"BigQuery export complete: {info}")
+    today = datetime.date.today()
+    last_export = get_last_export_date(pipeline) if mode == "incremental" else None
+    resources = []
+    replaced = set()
+    for spec in export_tables:
+        # Dimensions, and partitioned tables until their first export, are
+        # replaced in full
+        if (
+            spec.partition_column is None
+            or last_export is None
+            or get_exported_watermark(pipeline, spec.name, spec.partition_column) is None
+        ):
+            resources.append(export_resource(spec, postgres_schema, destination))
+            replaced.add(spec.name)
+            continue
+        first_recent = min(today, last_export) - datetime.timedelta(days=recent_days)
+        table_dates = changed_dates if spec.follows_runs else []
+        logger.info(f"{spec.name}: shipping partitions from {first_recent} and {len(table_dates)} changed dates")
+        resources.append(export_resource(
+            spec,
+            postgres_schema,
+            destination,
+            query_adapter_callback=create_partition_filter(spec.partition_column, first_recent, table_dates),
+        ))
+
+    if resources:
+        info = pipeline.run(resources, loader_file_format="parquet")
+
+        action = f"staged in {staging_url}" if staging else "loaded"
+        for table_name, size in sorted(get_file_bytes(info).items()):
+            logger.info(f"{table_name}: {size:,} bytes of Parquet {action}")
+        logger.info(f"BigQuery export complete: {info}")
+
+    # Recorded after the export, so a failed export is retried next run. Only
+    # a full replace brings a table in line with its fingerprint; tables that
+    # shipped partitions are recorded as partial, so they are not skipped
+    # until the next full replace
+    exported_at = datetime.datetime.now(datetime.timezone.utc)
+    manifest = dlt.resource(
+        [
+            {
+                "bigquery_dataset": bigquery_dataset,
+                "table_name": spec.name,
+                "exported_at": exported_at,
+                "mode": mode,
+                "status": get_manifest_status(spec.name, skipped, replaced),
+                "fingerprint": fingerprints[spec.name],
+            }
+            for spec in EXPORT_TABLES
+        ],
+        name=MANIFEST_TABLE,
+        write_disposition="append",
+    )
+    manifest_pipeline.run(manifest)
 
 
 @flow
-def export_all_to_bigquery() -> None:
-    """Export all bigquery schema tables to BigQuery."""
-    export_to_bigquery()
+def export_all_to_bigquery(mode: str = "incremental") -> None:
+    """Export all bigquery schema tables to BigQuery.
+
+    The hourly and nightly deployments share the bigquery_export pipeline,
+    so only one export runs at a time.
+    """
+    with exclusive_run("bigquery_export"):
+        export_to_bigquery(mode=mode)
 
 
 if __name__ == "__main__":
@@ -2,9 +2,10 @@
 CAD Import Flow - Tiered Reconciliation
 
 This module implements a tiered data reconciliation strategy:
-1. Recent (every 10 min): Last 24 hours to 7 days ahead
+1. Recent (every 10 min): Rows changed since the last run (persisted cursors),
+   falling back to the last 24 hours to 7 days ahead window
 2. Weekly (Sunday 0200): Last full week (Sun-Sat) to 7 days ahead + reference tables
-3. Monthly (1st of month 0200): Last month, processed week by week
+3. Monthly (1st of month 0200): Last month, processed as parallel, checkpointed week chunks
 
 Tables with date filtering:
 - cad_trip_legs_rev (modified) - uses composite PK (leg_id, rev)
@@ -14,31 +15,57 @@ Tables with date filtering:
 """
 
 import datetime
-import time
+from contextlib import suppress
 from typing import Callable
 
 import dlt
-from dlt.sources.sql_database import sql_table
+from sqlalchemy import Table, bindparam, func, select, text
+from sqlalchemy.exc import DBAPIError
 from prefect import flow
 from prefect.logging import get_run_logger
 
+from flows.chunks import run_week_chunks
+from flows.markets import DEFAULT_MAX_CONCURRENCY, MARKETS, run_for_markets
+from flows.pipelines import get_pipeline, merge_hints
+from flows.registry import plan
+from flows.sources import get_engine, get_recheck_window, reflect_table, source_table
+
+
+# Date-filtered CAD tables and reference tables, from flows/registry.py
+CAD_TABLES = plan("cad")
 
 # Date column mapping for filtered tables
 # Recent/weekly use 'modified' to catch updates; monthly uses 'leg_date' for full period coverage
-DATE_COLUMNS_RECENT = {
-    "cad_trip_legs_rev": "modified",
-    "cad_trip_legs": "created",
-    "cad_trips": "trip_date",
-    "cad_trip_history_log": "timestamp",
-}
+DATE_COLUMNS_RECENT = {spec.name: spec.window_column for spec in CAD_TABLES}
+DATE_COLUMNS_MONTHLY = {spec.name: spec.monthly_window_column for spec in CAD_TABLES}
+
+# Cursor columns for the incremental recent load. State is kept per pipeline,
+# i.e. per table and market. cad_trips is keyed on trip_date (a service date,
+# not a change timestamp), so it stays on the date window.
+INCREMENTAL_CURSORS = {spec.name: spec.cursor for spec in CAD_TABLES if spec.strategy == "incremental"}
+
+# Re-read this far behind each cursor to catch rows committed out of order
+INCREMENTAL_LOOKBACK = datetime.timedelta(minutes=15)
+
+# Reference/lookup tables loaded without date filtering
+REFERENCE_TABLES = [spec.name for spec in plan("cad_reference")]
 
-DATE_COLUMNS_MONTHLY = {
-    "cad_trip_legs_rev": "leg_date",
-    "cad_trip_legs": "created",
-    "cad_trips": "trip_date",
-    "cad_trip_history_log": "timestamp",
+# Reference tables that keep growing, with the column that marks updates to
+# existing rows (None if rows are only ever inserted). The recent load merges
+# just the new rows of these instead of replacing them.
+GROWING_REFERENCE_TABLES = {
+    spec.name: spec.cursor for spec in plan("cad_reference") if spec.strategy == "merge"
 }
 
+# Tables whose last modification time the server does not report (e.g.
+# UPDATE_TIME is NULL after a restart) and that have no change column can be
+# updated in place without changing their probe. They are replaced at least
+# this often, so such updates reach the warehouse within this age.
+MAX_UNTRACKED_SKIP_AGE = datetime.timedelta(hours=1)
+
+# Local pipeline state key holding the last reference table probes
+REFERENCE_PROBES_STATE_KEY = "reference_probes"
+
 
 def create_date_filter(
     start_date: datetime.datetime,
@@ -66,72 +93,216 @@ def create_date_filter(
     return filter_by_date
 
 
-def get_date_filtered_tables(source_name: str, date_filter: Callable) -> list:
-    """Create the four date-filtered tables with the given filter."""
-    cad_trip_legs_rev = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="cad_trip_legs_rev",
-        query_adapter_callback=date_filter,
-    ).apply_hints(primary_key=["leg_id", "rev"])
-
-    cad_trip_legs = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="cad_trip_legs",
-        query_adapter_callback=date_filter,
-    ).apply_hints(primary_key="id")
+def get_date_filtered_tables(
+    source_name: str,
+    date_filter: Callable,
+    incremental_start: datetime.datetime | None = None,
+) -> list:
+    """Create the date-filtered CAD tables with the given filter.
 
-    cad_trips = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="cad_trips",
-        query_adapter_callback=date_filter,
-    ).apply_hints(primary_key="id")
+    Args:
+        source_name: Name of the source configuration
+        date_filter: Query adapter applied to window-filtered tables
+        incremental_start: If set, tables in INCREMENTAL_CURSORS load incrementally
+                           from their persisted cursor instead of the date filter.
+                           Used as the cursor's initial value on the first run.
+    """
+    def date_filtered_table(table_name: str):
+        if incremental_start is None or table_name not in INCREMENTAL_CURSORS:
+            return source_table(
+                source_name,
+                table=table_name,
+                query_adapter_callback=date_filter,
+            )
 
-    cad_trip_history_log = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="cad_trip_history_log",
-        query_adapter_callback=date_filter,
-    ).apply_hints(primary_key="id")
+        return source_table(
+            source_name,
+            table=table_name,
+            incremental=dlt.sources.incremental(
+                INCREMENTAL_CURSORS[table_name],
+                initial_value=incremental_start,
+                lag=INCREMENTAL_LOOKBACK.total_seconds(),
+            ),
+        )
 
-    return [cad_trip_legs_rev, cad_trip_legs, cad_trips, cad_trip_history_log]
+    return [
+        date_filtered_table(spec.name).apply_hints(primary_key=list(spec.key))
+        for spec in CAD_TABLES
+    ]
 
 
 def get_reference_tables(source_name: str) -> list:
     """Create the reference/lookup tables (no date filtering)."""
-    epcr_cad_legs = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="epcr_v2_cad_legs"
-    )
+    return [
+        source_table(
+            source_name,
+            table=table_name,
+        )
+        for table_name in REFERENCE_TABLES
+    ]
 
-    epcr_v2_runs = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="epcr_v2_runs"
-    )
 
-    cad_trip_leg_shift_assignments = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="cad_trip_leg_shift_assignments"
-    )
+def get_update_times(connection, table_names: list[str]) -> dict[str, str | None]:
+    """Read the last modification time of source tables from information_schema.
 
-    cancel_reasons = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="cad_trip_cancel_reason",
-    )
+    The data dictionary answers this without touching the tables. MySQL 8
+    caches it for information_schema_stats_expiry seconds (a day by default),
+    so the session setting is lowered first where the server has it.
+    """
+    with suppress(DBAPIError):
+        connection.execute(text("SET SESSION information_schema_stats_expiry = 0"))
 
-    lost_call_reasons = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="cad_lost_call_status",
-    )
+    query = text(
+        "SELECT TABLE_NAME, UPDATE_TIME FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :table_names"
+    ).bindparams(bindparam("table_names", expanding=True))
+    rows = connection.execute(query, {"table_names": table_names})
+    return {row[0]: str(row[1]) if row[1] is not None else None for row in rows}
+
+
+def probe_reference_table(connection, table: Table, update_time: str | None) -> dict:
+    """Take a cheap fingerprint of a reference table.
 
-    return [epcr_cad_legs, epcr_v2_runs, cad_trip_leg_shift_assignments, cancel_reasons, lost_call_reasons]
+    Every table is probed with its UPDATE_TIME from get_update_times. Growing
+    tables add their max primary key and max change column, which are served
+    from indexes.
+    """
+    key_columns = list(table.primary_key.columns)
+    if table.name not in GROWING_REFERENCE_TABLES or len(key_columns) != 1:
+        return {"update_time": update_time}
+
+    key = key_columns[0]
+    change_column = GROWING_REFERENCE_TABLES[table.name]
+    probe_columns = [func.max(key)]
+    if change_column:
+        probe_columns.append(func.max(table.c[change_column]))
+    row = connection.execute(select(*probe_columns)).one()
+
+    return {
+        "update_time": update_time,
+        "key": key.name,
+        "max_key": row[0],
+        "max_changed": str(row[1]) if change_column else None,
+    }
+
+
+def get_changed_reference_tables(source_name: str, previous_probes: dict) -> tuple[list, dict]:
+    """Create resources for the reference tables that changed since the last probe.
+
+    - Untracked table (no UPDATE_TIME and no change column), last replaced
+      more than MAX_UNTRACKED_SKIP_AGE ago: full replace.
+    - Unchanged fingerprint: table is skipped.
+    - Growing table whose max key or max change column moved: only new keys,
+      plus rows past the last change column value, are merged. Rows deleted
+      at the same time stay until the weekly load replaces the table.
+    - Anything else, e.g. only UPDATE_TIME moved, or no previous probe: full
+      replace.
+
+    Args:
+        source_name: Name of the source configuration
+        previous_probes: Probes recorded after the last successful load, by table
+
+    Returns:
+        (resources to load, probes to record once the load succeeds)
+    """
+    logger = get_run_logger()
+    resources = []
+    probes = {}
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    with get_engine(source_name).connect() as connection:
+        update_times = get_update_times(connection, REFERENCE_TABLES)
+        for table_name in REFERENCE_TABLES:
+            table = reflect_table(source_name, table_name)
+            probe = probe_reference_table(connection, table, update_times.get(table_name))
+            previous = dict(previous_probes.get(table_name) or {})
+            probes[table_name] = probe
+
+            # Untracked tables also record the time of their last full replace
+            untracked = probe["update_time"] is None and not GROWING_REFERENCE_TABLES.get(table_name)
+            replaced_at = previous.pop("replaced_at", None)
+            if untracked:
+                if replaced_at is None or now - datetime.datetime.fromisoformat(replaced_at) > MAX_UNTRACKED_SKIP_AGE:
+                    logger.info(f"Reference table {table_name} not replaced for {MAX_UNTRACKED_SKIP_AGE}, replacing")
+                    probes[table_name] = {**probe, "replaced_at": now.isoformat()}
+                    resources.append(
+                        source_table(source_name, table_name)
+                        .apply_hints(write_disposition="replace")
+                    )
+                    continue
+                probes[table_name] = {**probe, "replaced_at": replaced_at}
+
+            if probe == previous:
+                logger.info(f"Reference table {table_name} unchanged, skipping")
+                continue
+
+            grew = (
+                previous.get("max_key") is not None
+                and probe.get("key") == previous.get("key")
+                and (probe["max_key"], probe["max_changed"]) != (previous["max_key"], previous["max_changed"])
+            )
+            if grew:
+                logger.info(f"Reference table {table_name} grew past key {previous['max_key']}, merging new keys")
+                resources.append(
+                    source_table(
+                        source_name,
+                        table=table_name,
+                        query_adapter_callback=create_growth_filter(
+                            probe["key"],
+                            previous["max_key"],
+                            GROWING_REFERENCE_TABLES[table_name],
+                            previous["max_changed"],
+                            get_recheck_window(table_name),
+                        ),
+                    ).apply_hints(primary_key=probe["key"], write_disposition="merge")
+                )
+                continue
+
+            logger.info(f"Reference table {table_name} changed, replacing")
+            if untracked:
+                probes[table_name] = {**probe, "replaced_at": now.isoformat()}
+            resources.append(
+                source_table(source_name, table_name)
+                .apply_hints(write_disposition="replace")
+            )
+
+    return resources, probes
+
+
+def create_growth_filter(
+    key_column: str,
+    last_key,
+    change_column: str | None,
+    last_changed: str | None,
+    recheck_window: int = 0,
+) -> Callable:
+    """Create a query adapter that selects rows past the last key or change value.
+
+    Rows within the table's re-check window (see get_recheck_window) below the
+    last key are read again, to pick up updates to recently inserted rows.
+    """
+    def filter_new_rows(query, table):
+        first_key = last_key - recheck_window if isinstance(last_key, int) else last_key
+        condition = table.c[key_column] > first_key
+        if change_column and last_changed not in (None, "None"):
+            condition = condition | (table.c[change_column] > last_changed)
+        return query.where(condition)
+    return filter_new_rows
 
 
 @flow
 def load_cad_recent(
     dataset_name: str,
     source_name: str,
+    incremental: bool = True,
 ) -> None:
     """
-    Load CAD trip data from the last 24 hours to 7 days ahead.
+    Load recent CAD trip data.
+
+    In incremental mode, tables in INCREMENTAL_CURSORS pull only rows past their
+    cursor from the previous run (minus INCREMENTAL_LOOKBACK). The pipeline name is
+    stable so dlt keeps the cursors between runs. cad_trips, and every table when
+    incremental is False, use the last 24 hours to 7 days ahead window.
 
     Intended to run every 10 minutes for near-real-time reconciliation.
     """
@@ -141,30 +312,39 @@ def load_cad_recent(
     start_date = now - datetime.timedelta(hours=24)
     end_date = now + datetime.timedelta(days=7)
 
-    logger.info(f"Loading recent CAD data: {start_date} to {end_date}")
+    logger.info(f"Loading recent CAD data: {start_date} to {end_date} (incremental={incremental})")
 
-    pipeline = dlt.pipeline(
-        pipeline_name=f"cad_recent_{dataset_name}_{int(time.time())}",
-        destination='postgres',
-        dataset_name=dataset_name,
-    )
+    pipeline = get_pipeline("cad_recent", dataset_name)
 
     date_filter = create_date_filter(start_date, end_date)
-    tables = get_date_filtered_tables(source_name, date_filter)
-
-    info = pipeline.run(tables, write_disposition="merge")
-    # Load reference tables (full replace)
-    ref_pipeline = dlt.pipeline(
-        pipeline_name=f"cad_weekly_ref_{dataset_name}_{int(time.time())}",
-        destination='postgres',
-        dataset_name=dataset_name,
+    tables = get_date_filtered_tables(
+        source_name,
+        date_filter,
+        incremental_start=start_date if incremental else None,
     )
 
-    reference_tables = get_reference_tables(source_name)
-
-    ref_info = ref_pipeline.run(reference_tables, write_disposition="replace")
+    info = pipeline.run(merge_hints(tables))
     logger.info(f"Recent load complete: {info}")
 
+    # Load only the reference tables whose probe changed since the last run.
+    # The weekly load still replaces them all as the reconciler.
+    ref_pipeline = get_pipeline("cad_recent_ref", dataset_name)
+
+    try:
+        previous_probes = ref_pipeline.get_local_state_val(REFERENCE_PROBES_STATE_KEY)
+    except KeyError:
+        previous_probes = {}
+
+    reference_tables, probes = get_changed_reference_tables(source_name, previous_probes)
+
+    if reference_tables:
+        ref_info = ref_pipeline.run(reference_tables)
+        logger.info(f"Recent reference tables load complete: {ref_info}")
+    else:
+        logger.info("No reference tables changed")
+
+    ref_pipeline.set_local_state_val(REFERENCE_PROBES_STATE_KEY, probes)
+
 
 @flow
 def load_cad_weekly(
@@ -196,24 +376,16 @@ def load_cad_weekly(
     logger.info(f"Loading weekly CAD data: {start_date} to {end_date}")
 
     # Load date-filtered tables
-    pipeline = dlt.pipeline(
-        pipeline_name=f"cad_weekly_{dataset_name}_{int(time.time())}",
-        destination='postgres',
-        dataset_name=dataset_name,
-    )
+    pipeline = get_pipeline("cad_weekly", dataset_name)
 
     date_filter = create_date_filter(start_date, end_date)
     date_filtered_tables = get_date_filtered_tables(source_name, date_filter)
 
-    info = pipeline.run(date_filtered_tables, write_disposition="merge")
+    info = pipeline.run(merge_hints(date_filtered_tables))
     logger.info(f"Weekly date-filtered load complete: {info}")
 
     # Load reference tables (full replace)
-    ref_pipeline = dlt.pipeline(
-        pipeline_name=f"cad_weekly_ref_{dataset_name}_{int(time.time())}",
-        destination='postgres',
-        dataset_name=dataset_name,
-    )
+    ref_pipeline = get_pipeline("cad_weekly_ref", dataset_name)
 
     reference_tables = get_reference_tables(source_name)
 
@@ -221,99 +393,105 @@ def load_cad_weekly(
     logger.info(f"Weekly reference tables load complete: {ref_info}")
 
 
+def load_leg_date_chunk(
+    pipeline: dlt.Pipeline,
+    source_name: str,
+    start_datetime: datetime.datetime,
+    end_datetime: datetime.datetime,
+):
+    """Load one chunk of the date-filtered tables using leg_date filtering."""
+    date_filter = create_date_filter(start_datetime, end_datetime, use_leg_date=True)
+    tables = get_date_filtered_tables(source_name, date_filter)
+    return pipeline.run(merge_hints(tables))
+
+
+def previous_month(today: datetime.date) -> tuple[datetime.date, datetime.date]:
+    """Return the first and last day of the month before today."""
+    last_of_prev_month = today.replace(day=1) - datetime.timedelta(days=1)
+    return last_of_prev_month.replace(day=1), last_of_prev_month
+
+
 @flow
 def load_cad_monthly(
     dataset_name: str,
     source_name: str,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
 ) -> None:
     """
     Load CAD trip data for the last full month, processed week by week.
 
+    Weeks load in parallel up to max_concurrency and are checkpointed, so a
+    re-run for the same month only loads the weeks that did not finish.
+
     Intended to run on the 1st of each month at 0200.
     """
     logger = get_run_logger()
 
-    today = datetime.date.today()
-    # First day of current month
-    first_of_current_month = today.replace(day=1)
-    # Last day of previous month
-    last_of_prev_month = first_of_current_month - datetime.timedelta(days=1)
-    # First day of previous month
-    first_of_prev_month = last_of_prev_month.replace(day=1)
+    first_of_prev_month, last_of_prev_month = previous_month(datetime.date.today())
 
     logger.info(f"Loading monthly CAD data for: {first_of_prev_month} to {last_of_prev_month}")
 
-    # Process week by week
-    current_start = first_of_prev_month
-    week_num = 1
-
-    while current_start <= last_of_prev_month:
-        # End of this week segment (7 days later or end of month)
-        week_end = min(current_start + datetime.timedelta(days=6), last_of_prev_month)
-
-        start_datetime = datetime.datetime.combine(current_start, datetime.time.min)
-        end_datetime = datetime.datetime.combine(week_end, datetime.time.max)
-
-        logger.info(f"Processing week {week_num}: {current_start} to {week_end}")
-
-        pipeline = dlt.pipeline(
-            pipeline_name=f"cad_monthly_w{week_num}_{dataset_name}_{int(time.time())}",
-            destination='postgres',
-            dataset_name=dataset_name,
-        )
-
-        # Use leg_date for monthly reconciliation to capture all runs in the period
-        date_filter = create_date_filter(start_datetime, end_datetime, use_leg_date=True)
-        tables = get_date_filtered_tables(source_name, date_filter)
-
-        info = pipeline.run(tables, write_disposition="merge")
-        logger.info(f"Week {week_num} complete: {info}")
-
-        # Move to next week
-        current_start = week_end + datetime.timedelta(days=1)
-        week_num += 1
+    # Use leg_date for monthly reconciliation to capture all runs in the period
+    run_week_chunks(
+        job_name="cad_monthly",
+        pipeline_prefix="cad_monthly",
+        markets=[(dataset_name, source_name)],
+        start=first_of_prev_month,
+        end=last_of_prev_month,
+        load_chunk=load_leg_date_chunk,
+        max_concurrency=max_concurrency,
+    )
 
-    logger.info(f"Monthly load complete - processed {week_num - 1} weeks")
+    logger.info("Monthly load complete")
 
 
 @flow
-def load_all_cad_recent() -> None:
-    """Load recent CAD data for all regions."""
-    load_cad_recent("traumasoft_tn", "tn_database")
-    load_cad_recent("traumasoft_mi", "mi_database")
-    load_cad_recent("traumasoft_il", "il_database")
+def load_all_cad_recent(max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+    """Load recent CAD data for all regions concurrently."""
+    run_for_markets(load_cad_recent, max_concurrency)
 
 
 @flow
-def load_all_cad_weekly() -> None:
-    """Load weekly CAD data for all regions."""
-    load_cad_weekly("traumasoft_tn", "tn_database")
-    load_cad_weekly("traumasoft_mi", "mi_database")
-    load_cad_weekly("traumasoft_il", "il_database")
+def load_all_cad_weekly(max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+    """Load weekly CAD data for all regions concurrently."""
+    run_for_markets(load_cad_weekly, max_concurrency)
 
 
 @flow
-def load_all_cad_monthly() -> None:
-    """Load monthly CAD data for all regions."""
-    load_cad_monthly("traumasoft_tn", "tn_database")
-    load_cad_monthly("traumasoft_mi", "mi_database")
-    load_cad_monthly("traumasoft_il", "il_database")
+def load_all_cad_monthly(max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+    """Load monthly CAD data for all regions, max_concurrency weeks at a time."""
+    first_of_prev_month, last_of_prev_month = previous_month(datetime.date.today())
+    run_week_chunks(
+        job_name="cad_monthly",
+        pipeline_prefix="cad_monthly",
+        markets=MARKETS,
+        start=first_of_prev_month,
+        end=last_of_prev_month,
+        load_chunk=load_leg_date_chunk,
+        max_concurrency=max_concurrency,
+    )
 
 
 @flow
 def load_cad_backfill(
     start_date: str,
     end_date: str,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
 ) -> None:
     """
     Backfill CAD data for a custom date range across all markets.
 
-    Processes the date range week by week using leg_date filtering.
+    Processes the date range week by week using leg_date filtering. The
+    weeks of all markets load in parallel up to max_concurrency. Finished
+    chunks are checkpointed per date range until the backfill completes, so
+    re-running the same backfill resumes with the chunks that have not
+    completed.
     Intended for manual runs to repopulate historical data.
 
     Args:
         start_date: Start date in YYYY-MM-DD format (inclusive)
         end_date: End date in YYYY-MM-DD format (inclusive)
+        max_concurrency: Maximum number of weeks loading at once
     """
     logger = get_run_logger()
 
@@ -322,44 +500,16 @@ def load_cad_backfill(
 
     logger.info(f"Starting backfill for all markets: {start} to {end}")
 
-    markets = [
-        ("traumasoft_tn", "tn_database"),
-        ("traumasoft_mi", "mi_database"),
-        ("traumasoft_il", "il_database"),
-    ]
-
-    for dataset_name, source_name in markets:
-        logger.info(f"Processing {dataset_name}")
-
-        # Process week by week
-        current_start = start
-        week_num = 1
-
-        while current_start <= end:
-            week_end = min(current_start + datetime.timedelta(days=6), end)
-
-            start_datetime = datetime.datetime.combine(current_start, datetime.time.min)
-            end_datetime = datetime.datetime.combine(week_end, datetime.time.max)
-
-            logger.info(f"  {dataset_name} week {week_num}: {current_start} to {week_end}")
-
-            pipeline = dlt.pipeline(
-                pipeline_name=f"cad_backfill_w{week_num}_{dataset_name}_{int(time.time())}",
-                destination='postgres',
-                dataset_name=dataset_name,
-            )
-
-            # Use leg_date for backfill to capture all runs in the period
-            date_filter = create_date_filter(start_datetime, end_datetime, use_leg_date=True)
-            tables = get_date_filtered_tables(source_name, date_filter)
-
-            info = pipeline.run(tables, write_disposition="merge")
-            logger.info(f"  Week {week_num} complete: {info}")
-
-            current_start = week_end + datetime.timedelta(days=1)
-            week_num += 1
-
-        logger.info(f"Completed {dataset_name} - processed {week_num - 1} weeks")
+    # Use leg_date for backfill to capture all runs in the period
+    run_week_chunks(
+        job_name="cad_backfill",
+        pipeline_prefix="cad_backfill",
+        markets=MARKETS,
+        start=start,
+        end=end,
+        load_chunk=load_leg_date_chunk,
+        max_concurrency=max_concurrency,
+    )
 
     logger.info("Backfill complete for all markets")
 
@@ -0,0 +1,173 @@
+"""
+Week Chunk Engine - Parallel, Resumable Date Range Loads
+
+Splits a date range into week chunks for each market and loads them on one
+worker pool of max_concurrency threads. Each chunk has its own pipeline and
+its own staging dataset, so chunks of the same dataset can merge in parallel;
+the first pending chunk of each market loads before the others, so they do
+not race to create the market's tables. A chunk's working directory and
+staging dataset are dropped once it has succeeded.
+
+Every finished chunk is recorded in the chunk_checkpoints table of its
+market's dataset under a key built from the job name and date range, so
+re-running the same job skips the chunks that already completed and resumes
+with the rest, however long after the failure. Once every chunk of a market
+has completed its checkpoints are deleted, and a later run of the same job
+loads the whole range again.
+"""
+
+import datetime
+import shutil
+from typing import Callable
+
+import dlt
+from dlt.destinations.exceptions import DatabaseUndefinedRelation
+from prefect.logging import get_run_logger
+
+from flows.markets import DEFAULT_MAX_CONCURRENCY, run_concurrently
+from flows.pipelines import get_pipeline
+
+
+CHECKPOINT_TABLE = "chunk_checkpoints"
+
+
+def week_chunks(start: datetime.date, end: datetime.date) -> list[tuple[datetime.date, datetime.date]]:
+    """Split an inclusive date range into consecutive 7-day chunks."""
+    chunks = []
+    current_start = start
+    while current_start <= end:
+        week_end = min(current_start + datetime.timedelta(days=6), end)
+        chunks.append((current_start, week_end))
+        current_start = week_end + datetime.timedelta(days=1)
+    return chunks
+
+
+def checkpoint_key(job_name: str, start: datetime.date, end: datetime.date) -> str:
+    """Build the checkpoint key of a job run over a date range."""
+    return f"{job_name}_{start:%Y%m%d}_{end:%Y%m%d}"
+
+
+def get_completed_chunks(dataset_name: str, job_key: str) -> set[datetime.date]:
+    """Return the chunk start dates recorded for a job key in a dataset."""
+    pipeline = get_pipeline("chunk_checkpoints", dataset_name)
+    try:
+        with pipeline.sql_client() as client:
+            table = client.make_qualified_table_name(CHECKPOINT_TABLE)
+            rows = client.execute_sql(f"SELECT chunk_start FROM {table} WHERE job_name = %s", job_key)
+    except DatabaseUndefinedRelation:
+        return set()
+    return {row[0] for row in rows or []}
+
+
+def clear_checkpoints(dataset_name: str, job_key: str) -> None:
+    """Delete the checkpoints of a completed job key in a dataset."""
+    pipeline = get_pipeline("chunk_checkpoints", dataset_name)
+    try:
+        with pipeline.sql_client() as client:
+            table = client.make_qualified_table_name(CHECKPOINT_TABLE)
+            client.execute_sql(f"DELETE FROM {table} WHERE job_name = %s", job_key)
+    except DatabaseUndefinedRelation:
+        pass
+
+
+def record_chunk(
+    pipeline: dlt.Pipeline,
+    job_key: str,
+    chunk_start: datetime.date,
+    chunk_end: datetime.date,
+) -> None:
+    """Record a finished chunk in the checkpoint table of the pipeline's dataset."""
+    checkpoint = dlt.resource(
+        [{
+            "job_name": job_key,
+            "chunk_start": chunk_start,
+            "chunk_end": chunk_end,
+            "completed_at": datetime.datetime.now(datetime.timezone.utc),
+        }],
+        name=CHECKPOINT_TABLE,
+        primary_key=["job_name", "chunk_start"],
+        write_disposition="merge",
+    )
+    pipeline.run(checkpoint)
+
+
+def get_chunk_pipeline(pipeline_prefix: str, dataset_name: str, chunk_start: datetime.date) -> dlt.Pipeline:
+    """Get the pipeline of one chunk, with a staging dataset of its own."""
+    suffix = f"{chunk_start:%Y%m%d}"
+    destination = dlt.destinations.postgres(staging_dataset_name_layout=f"%s_staging_{suffix}")
+    return get_pipeline(f"{pipeline_prefix}_{suffix}", dataset_name, destination=destination)
+
+
+def drop_chunk_pipeline(pipeline: dlt.Pipeline) -> None:
+    """Drop the staging dataset and local working directory of a finished chunk."""
+    with pipeline.sql_client() as client, client.with_staging_dataset():
+        if client.has_dataset():
+            client.drop_dataset()
+    shutil.rmtree(pipeline.working_dir, ignore_errors=True)
+
+
+def run_week_chunks(
+    job_name: str,
+    pipeline_prefix: str,
+    markets: list[tuple[str, str]],
+    start: datetime.date,
+    end: datetime.date,
+    load_chunk: Callable[[dlt.Pipeline, str, datetime.datetime, datetime.datetime], object],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> None:
+    """Load every (market, week) chunk of a date range, skipping completed ones.
+
+    Args:
+        job_name: Checkpoint name; re-running with the same job_name, start
+            and end resumes
+        pipeline_prefix: Prefix for the per-chunk pipeline names
+        markets: (dataset_name, source_name) pairs to load
+        start: Start date (inclusive)
+        end: End date (inclusive)
+        load_chunk: Called as load_chunk(pipeline, source_name, start, end) for each chunk
+        max_concurrency: Maximum number of chunks loading at once, across markets
+
+    Raises:
+        RuntimeError: If any chunk failed, after all chunks have finished
+    """
+    logger = get_run_logger()
+    job_key = checkpoint_key(job_name, start, end)
+    chunks = week_chunks(start, end)
+    first_jobs = {}
+    other_jobs = {}
+
+    def make_job(dataset_name, source_name, chunk_start, chunk_end):
+        def job():
+            pipeline = get_chunk_pipeline(pipeline_prefix, dataset_name, chunk_start)
+            start_datetime = datetime.datetime.combine(chunk_start, datetime.time.min)
+            end_datetime = datetime.datetime.combine(chunk_end, datetime.time.max)
+            info = load_chunk(pipeline, source_name, start_datetime, end_datetime)
+            record_chunk(pipeline, job_key, chunk_start, chunk_end)
+            drop_chunk_pipeline(pipeline)
+            logger.info(f"{dataset_name} week {chunk_start} to {chunk_end} complete: {info}")
+
+        return job
+
+    for dataset_name, source_name in markets:
+        completed = get_completed_chunks(dataset_name, job_key)
+        pending = [chunk for chunk in chunks if chunk[0] not in completed]
+        logger.info(
+            f"{job_key} {dataset_name}: {len(chunks) - len(pending)} of {len(chunks)} weeks "
+            f"already complete, {len(pending)} to load"
+        )
+        for i, (chunk_start, chunk_end) in enumerate(pending):
+            jobs = first_jobs if i == 0 else other_jobs
+            jobs[f"{dataset_name} week {chunk_start}"] = make_job(dataset_name, source_name, chunk_start, chunk_end)
+
+    failures = run_concurrently(first_jobs, max_concurrency)
+    failures.update(run_concurrently(other_jobs, max_concurrency))
+
+    for dataset_name, _ in markets:
+        if not any(name.startswith(f"{dataset_name} ") for name in failures):
+            clear_checkpoints(dataset_name, job_key)
+
+    if failures:
+        raise RuntimeError(
+            f"{job_key}: {len(failures)} of {len(first_jobs) + len(other_jobs)} chunks failed, "
+            f"re-run to resume: {', '.join(sorted(failures))}"
+        )
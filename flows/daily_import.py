@@ -3,36 +3,42 @@ import datetime
 from typing import Sequence, Tuple, Optional, List
 
 import dlt
-from dlt.sources.sql_database import sql_database, sql_table, Table, remove_nullability_adapter
+from dlt.sources.sql_database import sql_database, Table, remove_nullability_adapter
 from prefect import flow, task
 from prefect.logging import get_run_logger
 
+from flows.hash_diff import hash_diff_tables
+from flows.pipelines import (
+    DEFAULT_EXTRACT_WORKERS,
+    DEFAULT_LOAD_WORKERS,
+    DEFAULT_NORMALIZE_WORKERS,
+    get_pipeline,
+    merge_hints,
+    run_parallel,
+)
+from flows.registry import plan
+from flows.sources import source_table
+
+# (tablename, modified column, columns to pull, None for all), largest first
 tables: list[tuple[str, str | None, list[str] | None]] = [
-    # (tablename, modified column, columns to pull, None for all)
-    ('sched_unit_types', None, None),
-    ('ibd_level_of_service', None, None),
-    ('ibd_subzones', None, None),
-    ('cad_sources', None, None),
-    ('users', None, ['user_id', 'employee_num', 'employee_level', 'employee_licensure', 'username', 'job_title',
-                     'job_title_id', 'first_name', 'last_name', 'preferred_first_name', 'email_address', 'user_group',
-                     'user_division', 'division', 'disabled', 'deactivated','hourly_wage']),
-    ('sched_units', None, None),
-    ('sched_vehicles',None, None),
-    ('sched_unit_certification_templates', None, None),
-    ('cost_centers', None, None),
-    ('sched_unit_personnel', None, None),
-    ('sched_shifts', None, None),
-    ('sched_earning_codes', None, None),
-    ('cad_reasons_for_transport', None, None),
-    ('user_job_titles', None, None),
-    ('sched_pay_periods', None, None),
-    ('ibd_attachment_types', None, None),
+    (spec.name, spec.cursor, list(spec.included_columns) if spec.included_columns else None)
+    for spec in plan("daily_import")
 ]
 
+# Load modes for tables without a modified column:
+# - hash_diff: write only inserted, updated and deleted rows (flows/hash_diff.py)
+# - replace: drop and rewrite every table
+LOAD_MODES = ["hash_diff", "replace"]
+
+
 @task
 def daily_import_pipeline(
         dataset_name: str,
-        source_name: str
+        source_name: str,
+        mode: str = "hash_diff",
+        extract_workers: int = DEFAULT_EXTRACT_WORKERS,
+        normalize_workers: int = DEFAULT_NORMALIZE_WORKERS,
+        load_workers: int = DEFAULT_LOAD_WORKERS,
 ) -> None:
     """
     Load tables from database with flexible configuration.
@@ -40,45 +46,67 @@ def daily_import_pipeline(
     Args:
         dataset_name: Name of the dataset to load into
         source_name: Name of the source configuration
+        mode: Load mode for tables without a modified column, see LOAD_MODES
+        extract_workers: Tables extracted from the source at once
+        normalize_workers: Normalize worker processes
+        load_workers: Load jobs run against the warehouse at once
         tables: List of tuples containing:
             - table_name: Name of the table to load
-            - modified_column: Column name for incremental loading (None for full reload)
+            - modified_column: Column name for incremental loading (None for full reload).
+              Those tables are merged on their primary key, only pulling rows
+              modified since the last run.
             - columns_to_pull: List of specific columns to pull (None for all columns)
     """
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown daily import mode '{mode}', expected one of {LOAD_MODES}")
+
     logger = get_run_logger()
-    pipeline = dlt.pipeline(
-        pipeline_name=f"daily_import_{dataset_name}",
-        destination='postgres',
-        dataset_name=dataset_name,
-    )
+    pipeline = get_pipeline("daily_import", dataset_name)
     table_sources = []
     for table_name, modified_column, columns_to_pull in tables:
-        table_source = sql_table(
-            credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-            table=table_name,
-
-            included_columns=columns_to_pull
-        )
-
         if modified_column:
-            table_source.apply_hints(
+            table_source = source_table(
+                source_name,
+                table=table_name,
+                included_columns=columns_to_pull,
                 incremental=dlt.sources.incremental(
                     modified_column,
-                    initial_value=datetime.datetime(2025,1,1,0,0,0)
-                )
+                    initial_value=datetime.datetime(2025, 1, 1, 0, 0, 0)
+                ),
+            )
+            table_sources += merge_hints([table_source])
+            logger.info(f"Configured table: {table_name} (incremental on {modified_column})")
+        elif mode == "hash_diff":
+            resources, deleted = hash_diff_tables(
+                pipeline,
+                source_name,
+                table_name,
+                included_columns=columns_to_pull,
             )
-        table_sources.append(table_source)
-        logger.info(f"Configured table: {table_name}")
+            table_sources += resources
+            logger.info(f"Configured table: {table_name} (hash diff, {deleted} deleted)")
+        else:
+            table_source = source_table(
+                source_name,
+                table=table_name,
+                included_columns=columns_to_pull,
+            ).apply_hints(write_disposition="replace")
+            table_sources.append(table_source)
+            logger.info(f"Configured table: {table_name} (replace)")
 
-    info = pipeline.run(table_sources, write_disposition="replace")
+    info = run_parallel(pipeline, table_sources, extract_workers, normalize_workers, load_workers)
     logger.info(f"Finished loading table {info}")
 
 @flow
 def daily_import(
         dataset_name: str,
         source_name: str,
+        mode: str = "hash_diff",
+        extract_workers: int = DEFAULT_EXTRACT_WORKERS,
+        normalize_workers: int = DEFAULT_NORMALIZE_WORKERS,
+        load_workers: int = DEFAULT_LOAD_WORKERS,
 ):
-    daily_import_pipeline(dataset_name, source_name)
+    daily_import_pipeline(dataset_name, source_name, mode, extract_workers, normalize_workers, load_workers)
 
 if __name__ == "__main__":
     daily_import("traumasoft_tn", "tn_database")
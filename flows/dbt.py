@@ -4,12 +4,24 @@ from prefect import flow, get_run_logger
 from prefect_shell import ShellOperation
 from prefect.blocks.system import Secret
 
+from flows.pipelines import exclusive_run
+
 # Extract constants for better maintainability
 DBT_COMMANDS = ["uv run dbt deps --target prod", "uv run dbt build --target prod"]
 DEFAULT_DBT_DIR = "./lan_dbt"
+FULL_REFRESH_FLAG = "--full-refresh"
+# Global concurrency limit shared by the hourly run and the weekly full
+# refresh, which rebuild the same incremental models
+DBT_CONCURRENCY_LIMIT = "dbt"
 
 @flow(name="dbt-flow", log_prints=True)
-def run_dbt():
+def run_dbt(full_refresh: bool = False):
+    """
+    Run dbt deps and dbt build against the prod target.
+
+    Args:
+        full_refresh: Rebuild incremental models (e.g. stg_timesheet) from scratch
+    """
     logger = get_run_logger()
 
     db_user = Secret.load("warehouse-user")
@@ -22,34 +34,40 @@ def run_dbt():
     
     logger.info(f"Running dbt commands in directory: {dbt_path}")
     
-    # Run commands sequentially with individual error handling
-    for command in DBT_COMMANDS:
-        logger.info(f"Executing: {command}")
-        try:
-            shell_operation = ShellOperation(
-                commands=[command],
-                working_dir=str(dbt_path),
-                env={"DBT_PROFILES_DIR": str(dbt_path),
-                     "WAREHOUSE_USER": db_user.get(),
-                     "WAREHOUSE_PASS": db_password.get()}
-            )
-            result = shell_operation.run()
+    commands = list(DBT_COMMANDS)
+    if full_refresh:
+        commands[-1] = f"{commands[-1]} {FULL_REFRESH_FLAG}"
+
+    # Run commands sequentially with individual error handling, one dbt
+    # invocation at a time across the dbt deployments
+    with exclusive_run(DBT_CONCURRENCY_LIMIT):
+        for command in commands:
+            logger.info(f"Executing: {command}")
+            try:
+                shell_operation = ShellOperation(
+                    commands=[command],
+                    working_dir=str(dbt_path),
+                    env={"DBT_PROFILES_DIR": str(dbt_path),
+                         "WAREHOUSE_USER": db_user.get(),
+                         "WAREHOUSE_PASS": db_password.get()}
+                )
+                result = shell_operation.run()
             
-            # Handle different return types from ShellOperation
-            if hasattr(result, 'stdout') and result.stdout:
-                for line in result.stdout.split('\n'):
-                    if line.strip():
-                        logger.info(line)
-            elif isinstance(result, (list, tuple)):
-                for line in result:
-                    if line and str(line).strip():
-                        logger.info(str(line))
-            else:
-                logger.info(f"Command completed: {command}")
+                # Handle different return types from ShellOperation
+                if hasattr(result, 'stdout') and result.stdout:
+                    for line in result.stdout.split('\n'):
+                        if line.strip():
+                            logger.info(line)
+                elif isinstance(result, (list, tuple)):
+                    for line in result:
+                        if line and str(line).strip():
+                            logger.info(str(line))
+                else:
+                    logger.info(f"Command completed: {command}")
                 
-        except Exception as e:
-            logger.error(f"Command '{command}' failed: {str(e)}")
-            raise Exception(f"dbt flow failed at command '{command}': {str(e)}")
+            except Exception as e:
+                logger.error(f"Command '{command}' failed: {str(e)}")
+                raise Exception(f"dbt flow failed at command '{command}': {str(e)}")
     
     logger.info("dbt flow completed successfully")
 
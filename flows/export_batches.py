@@ -3,66 +3,49 @@ import datetime
 from typing import Sequence, Tuple, Optional, List
 
 import dlt
-from dlt.sources.sql_database import sql_database, sql_table, Table, remove_nullability_adapter
+from dlt.sources.sql_database import sql_database, Table, remove_nullability_adapter
 from prefect import flow, task
 from prefect.logging import get_run_logger
 
-def transform_zero_dates(item):
-    """Traumasoft database is fucking stupid, so we need to set 0000-00-00 00:00:00 to NULL"""
-    if isinstance(item, dict):
-        for key, value in item.items():
-            if key == 'finalize_date' and (value == '0000-00-00 00:00:00' or str(value).startswith('0000-00-00')):
-                item[key] = None
-    return item
+from flows.pipelines import get_pipeline, merge_hints
+from flows.registry import plan
+from flows.sources import get_recheck_window, source_table
 
 @task
 def export_batches(
         dataset_name: str,
         source_name: str
 ) -> None:
+    """
+    Load the ePCR export batch tables.
 
-    logger = get_run_logger()
-    pipeline = dlt.pipeline(
-        pipeline_name=f"daily_import_{dataset_name}",
-        destination='postgres',
-        dataset_name=dataset_name,
-    )
-    batches = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="epcr_v3_submit_batches",
-    )
-    batches.apply_hints(
-        primary_key="id",
-        write_disposition="merge",
-    )
-    batches_results = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="epcr_v3_submit_batches_results",
-    )
-    batches_results.apply_hints(
-        primary_key="batch_id",
-        write_disposition="merge",
-    )
-    export_trigger = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="epcr_v3_export_trigger_log",
-    )
-    export_trigger.apply_hints(
-        primary_key="id",
-        write_disposition="merge",
-    )
-    epcr_runs = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="epcr_v2_runs",
-    )
+    The tables only grow or change near their tail, so each is read by keyset
+    on its id: only ids past the cursor of the previous run, minus the table's
+    re-check window (see get_recheck_window), in id order. The pipeline name is
+    stable so dlt keeps the cursors between runs; the first run reads the full
+    history.
 
-    epcr_runs.add_map(transform_zero_dates)
-    epcr_runs.apply_hints(
-        columns={"finalize_date": {"nullable": True}},
-        primary_key="id",
-        write_disposition="merge",
-    )
-    info = pipeline.run([batches,batches_results,export_trigger, epcr_runs])
+    epcr_v2_runs is owned by the CAD reference loads (flows/cad_import.py).
+    """
+    logger = get_run_logger()
+    pipeline = get_pipeline("export_batches", dataset_name)
+    resources = [
+        source_table(
+            source_name,
+            table=spec.name,
+            incremental=dlt.sources.incremental(
+                spec.cursor,
+                initial_value=0,
+                lag=get_recheck_window(spec.name),
+                row_order="asc",
+            ),
+        ).apply_hints(
+            primary_key=list(spec.key),
+            write_disposition="merge",
+        )
+        for spec in plan("export_batches")
+    ]
+    info = pipeline.run(merge_hints(resources))
     logger.info(f"Finished loading table {info}")
 
 @flow
@@ -0,0 +1,216 @@
+"""
+Hash-Diff Merge Mode
+
+Loads a table by writing only the rows that changed since the last load,
+instead of replacing the whole table:
+
+1. The primary key and _row_hash of every row already in the warehouse
+   table are read.
+2. During extraction a _row_hash (md5 of all extracted columns) is added to
+   each row. Rows whose hash matches the stored one are dropped before
+   normalize, so only inserted and updated rows are written.
+3. A key-only query on the source finds warehouse keys that no longer
+   exist. Their stored rows are written back flagged as hard deletes through
+   a second resource on the same table.
+
+The stored hashes live in the table itself, so the first hash-diff load of
+a table that was replaced before writes it in full once. A table without a
+primary key cannot be diffed and is replaced in full, with a warning.
+
+Step 3 also works on its own: reconcile_deletes compares only the keys of a
+warehouse table with the source, for tables loaded incrementally by some
+other cursor, which cannot see deletes.
+"""
+
+import hashlib
+
+import dlt
+from dlt.destinations.exceptions import DatabaseTerminalException, DatabaseUndefinedRelation
+from prefect.logging import get_run_logger
+from sqlalchemy import select
+
+from flows.batch_columns import MapBatch
+from flows.pipelines import merge_hints
+from flows.sources import get_engine, reflect_table, source_table
+
+
+HASH_COLUMN = "_row_hash"
+DELETED_COLUMN = "_deleted"
+
+# Deleted keys read back from the warehouse per query
+DELETE_BATCH_SIZE = 1000
+
+DELETE_COLUMNS = {
+    DELETED_COLUMN: {"data_type": "bool", "nullable": True, "hard_delete": True},
+}
+
+HASH_DIFF_COLUMNS = {
+    HASH_COLUMN: {"data_type": "text", "nullable": True},
+    **DELETE_COLUMNS,
+}
+
+
+def row_hash(row: dict) -> str:
+    """md5 of a row's values in column name order."""
+    values = "\x1f".join(repr(row[name]) for name in sorted(row) if name != HASH_COLUMN)
+    return hashlib.md5(values.encode()).hexdigest()
+
+
+def get_primary_key(source_name: str, table_name: str) -> list[str]:
+    """Return the primary key columns of a reflected source table."""
+    return [column.name for column in reflect_table(source_name, table_name).primary_key.columns]
+
+
+def get_stored_hashes(pipeline: dlt.Pipeline, table_name: str, key: list[str]) -> dict[tuple, str | None]:
+    """Return {key tuple: _row_hash} of the rows in a warehouse table.
+
+    Empty if the table does not exist or was not loaded with hash-diff yet.
+    """
+    try:
+        with pipeline.sql_client() as client:
+            table = client.make_qualified_table_name(table_name)
+            columns = ", ".join(client.escape_column_name(name) for name in [*key, HASH_COLUMN])
+            rows = client.execute_sql(f"SELECT {columns} FROM {table}")
+    except (DatabaseUndefinedRelation, DatabaseTerminalException):
+        return {}
+    return {tuple(row[:-1]): row[-1] for row in rows or []}
+
+
+def get_stored_keys(pipeline: dlt.Pipeline, table_name: str, key: list[str]) -> set[tuple]:
+    """Return every primary key of a warehouse table, empty if it does not exist."""
+    try:
+        with pipeline.sql_client() as client:
+            table = client.make_qualified_table_name(table_name)
+            columns = ", ".join(client.escape_column_name(name) for name in key)
+            rows = client.execute_sql(f"SELECT {columns} FROM {table}")
+    except DatabaseUndefinedRelation:
+        return set()
+    return {tuple(row) for row in rows or []}
+
+
+def get_source_keys(source_name: str, table_name: str, key: list[str]) -> set[tuple]:
+    """Return every primary key of a source table with a key-only query."""
+    table = reflect_table(source_name, table_name)
+    with get_engine(source_name).connect() as connection:
+        return {tuple(row) for row in connection.execute(select(*[table.c[name] for name in key]))}
+
+
+def get_deleted_rows(pipeline: dlt.Pipeline, table_name: str, key: list[str], deleted_keys: set[tuple]) -> list[dict]:
+    """Read the stored rows of deleted keys and flag them as hard deletes.
+
+    Full rows are sent rather than bare keys, so the staging table's NOT
+    NULL columns are satisfied.
+    """
+    deleted_rows = []
+    keys = list(deleted_keys)
+    placeholder = "(" + ", ".join(["%s"] * len(key)) + ")"
+    with pipeline.sql_client() as client:
+        table = client.make_qualified_table_name(table_name)
+        columns = ", ".join(client.escape_column_name(name) for name in key)
+        for start in range(0, len(keys), DELETE_BATCH_SIZE):
+            batch = keys[start:start + DELETE_BATCH_SIZE]
+            query = f"SELECT * FROM {table} WHERE ({columns}) IN ({', '.join([placeholder] * len(batch))})"
+            with client.execute_query(query, *[value for values in batch for value in values]) as cursor:
+                names = [column[0] for column in cursor.description]
+                deleted_rows.extend(
+                    {**{name: value for name, value in zip(names, row) if not name.startswith("_dlt_")},
+                     DELETED_COLUMN: True}
+                    for row in cursor.fetchall()
+                )
+    return deleted_rows
+
+
+def deletes_resource(
+    pipeline: dlt.Pipeline,
+    table_name: str,
+    key: list[str],
+    deleted_keys: set[tuple],
+    columns: dict = DELETE_COLUMNS,
+):
+    """Create a resource writing the stored rows of deleted keys as hard deletes."""
+    return dlt.resource(
+        get_deleted_rows(pipeline, table_name, key, deleted_keys),
+        name=f"{table_name}_deletes",
+        table_name=table_name,
+        primary_key=key,
+        columns=columns,
+    )
+
+
+def reconcile_deletes(
+    pipeline: dlt.Pipeline,
+    source_name: str,
+    table_name: str,
+    key: list[str],
+) -> tuple[list, int]:
+    """Find warehouse rows gone from the source with key-only queries on both sides.
+
+    Returns:
+        (resources, deleted): a hard delete resource for the table, empty if
+        nothing was deleted, and the number of deleted keys
+    """
+    stored_keys = get_stored_keys(pipeline, table_name, key)
+    deleted_keys = stored_keys - get_source_keys(source_name, table_name, key) if stored_keys else set()
+    if not deleted_keys:
+        return [], 0
+    return [deletes_resource(pipeline, table_name, key, deleted_keys)], len(deleted_keys)
+
+
+def make_changed_filter(key: list[str], stored_hashes: dict[tuple, str | None]):
+    """Build a batch step that adds _row_hash and drops unchanged rows."""
+    def filter_changed(rows):
+        if isinstance(rows, dict):
+            rows = [rows]
+        changed = []
+        for row in rows:
+            hashed = row_hash(row)
+            if stored_hashes.get(tuple(row[name] for name in key)) != hashed:
+                row[HASH_COLUMN] = hashed
+                changed.append(row)
+        return changed or None
+
+    return filter_changed
+
+
+def hash_diff_tables(
+    pipeline: dlt.Pipeline,
+    source_name: str,
+    table_name: str,
+    primary_key: list[str] | None = None,
+    **kwargs,
+) -> tuple[list, int]:
+    """Create the resources for a hash-diff merge of one table.
+
+    Args:
+        pipeline: Pipeline the resources will be loaded with
+        source_name: Source configuration name, e.g. tn_database
+        table_name: Source and warehouse table name
+        primary_key: Key columns, defaults to the reflected primary key
+        **kwargs: Passed through to source_table (included_columns, ...)
+
+    Returns:
+        (resources, deleted): the changed-rows resource, plus a hard delete
+        resource if any warehouse keys are gone from the source, and the
+        number of deleted keys. The resources are hinted for a merge load,
+        except for a table without a primary key, which falls back to a
+        single full replace resource.
+    """
+    key = primary_key or get_primary_key(source_name, table_name)
+    if not key:
+        get_run_logger().warning(f"{table_name} has no primary key, replacing it in full instead of hash-diff")
+        return [source_table(source_name, table=table_name, **kwargs).apply_hints(write_disposition="replace")], 0
+
+    stored_hashes = get_stored_hashes(pipeline, table_name, key)
+
+    # Rows are hashed in Python either way, so they stay row dicts, which is
+    # also the item type of the delete rows on the same table
+    changed = source_table(source_name, table=table_name, backend="sqlalchemy", **kwargs)
+    changed.add_step(MapBatch(make_changed_filter(key, stored_hashes)))
+    changed.apply_hints(primary_key=key, columns=HASH_DIFF_COLUMNS)
+    resources = [changed]
+
+    deleted_keys = set(stored_hashes) - get_source_keys(source_name, table_name, key) if stored_hashes else set()
+    if deleted_keys:
+        resources.append(deletes_resource(pipeline, table_name, key, deleted_keys, HASH_DIFF_COLUMNS))
+
+    return merge_hints(resources), len(deleted_keys)
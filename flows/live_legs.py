@@ -0,0 +1,160 @@
+"""
+Live Trip Legs
+
+A long-running micro-batch poller that keeps today's trip legs about a minute
+fresh for dispatch metrics (on-time performance, unit status), while
+load_cad_recent in flows/cad_import.py stays the 10-minute reconciler of
+cad_trip_legs_rev.
+
+Every POLL_INTERVAL the poller reads the cad_trip_legs_rev revisions of the
+current service day modified since its in-memory cursor (minus
+POLL_LOOKBACK), over one connection held open for the whole run. Only
+revisions not already shipped with the same modified value are merged into
+the narrow cad_trip_legs_rev_live table. The service day is the current
+date in the market's timezone (flows/markets.py). Legs of earlier service
+days are purged from it when the day rolls over; they are in
+cad_trip_legs_rev by then. Polled rows go through the same date sanitizer
+as every source_table resource (flows/sanitize.py).
+"""
+
+import datetime
+import time
+
+import dlt
+from dlt.destinations.exceptions import DatabaseUndefinedRelation
+from prefect import flow
+from prefect.logging import get_run_logger
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+from flows.markets import market_today
+from flows.pipelines import get_pipeline, merge_hints
+from flows.sanitize import get_date_columns, make_sanitizer
+from flows.sources import get_engine, reflect_table
+
+SOURCE_TABLE = "cad_trip_legs_rev"
+LIVE_TABLE = "cad_trip_legs_rev_live"
+KEY_COLUMNS = ["leg_id", "rev"]
+CURSOR_COLUMN = "modified"
+SERVICE_DATE_COLUMN = "leg_date"
+
+# Columns used by the on-time and unit status models (stg_runs,
+# stg_run_timestamps), instead of the full width of cad_trip_legs_rev
+LIVE_COLUMNS = [
+    "leg_id", "rev", "leg_date", "modified", "trip_status", "last_status_id",
+    "calltype_id", "los_id", "priority_id", "transport_priority_id", "emergency",
+    "source_id", "vehicle_id", "response_zone_id",
+    "pickup_time", "orig_pickup_time", "requested_pickup_time", "appt_time",
+    "call_started_date", "assigned_time", "acknowledged_time", "enroute_time",
+    "at_scene_time", "transporting_time", "at_destination_time", "clear_time",
+    "canceled_time", "last_status_timestamp", "atpatientbs_time",
+]
+
+POLL_INTERVAL = datetime.timedelta(seconds=60)
+
+# Re-read this far behind the cursor to catch rows committed out of order
+POLL_LOOKBACK = datetime.timedelta(minutes=2)
+
+# A run polls this long, then the next scheduled run takes over
+RUN_DURATION = datetime.timedelta(hours=1)
+
+
+def poll_changed_legs(
+    connection: Connection,
+    source_name: str,
+    service_date: datetime.date,
+    since: datetime.datetime | None,
+) -> list[dict]:
+    """Read the live columns of a service day's revisions modified at or after since.
+
+    Invalid dates are NULLed as in source_table.
+    """
+    table = reflect_table(source_name, SOURCE_TABLE)
+    columns = [table.c[name] for name in LIVE_COLUMNS if name in table.c]
+    query = select(*columns).where(table.c[SERVICE_DATE_COLUMN] == service_date)
+    if since is not None:
+        query = query.where(table.c[CURSOR_COLUMN] >= since)
+    rows = [dict(row._mapping) for row in connection.execute(query)]
+    sanitize = make_sanitizer(table)
+    return [sanitize(row) for row in rows] if sanitize else rows
+
+
+def purge_live_legs(pipeline: dlt.Pipeline, service_date: datetime.date) -> None:
+    """Delete legs of service days before service_date from the live table."""
+    try:
+        with pipeline.sql_client() as client:
+            table = client.make_qualified_table_name(LIVE_TABLE)
+            client.execute_sql(f"DELETE FROM {table} WHERE {SERVICE_DATE_COLUMN} < %s", service_date)
+    except DatabaseUndefinedRelation:
+        pass
+
+
+@flow
+def poll_live_legs(
+    dataset_name: str,
+    source_name: str,
+    poll_seconds: int = int(POLL_INTERVAL.total_seconds()),
+    run_minutes: int = int(RUN_DURATION.total_seconds() // 60),
+) -> None:
+    """
+    Poll today's trip leg revisions into the live table until run_minutes pass.
+
+    Args:
+        dataset_name: Name of the dataset to load into
+        source_name: Name of the source configuration
+        poll_seconds: Seconds between the starts of two polls
+        run_minutes: Minutes to keep polling before returning
+    """
+    logger = get_run_logger()
+    pipeline = get_pipeline("cad_live", dataset_name)
+
+    date_columns = [
+        name for name in get_date_columns(reflect_table(source_name, SOURCE_TABLE)) if name in LIVE_COLUMNS
+    ]
+
+    stop_at = time.monotonic() + run_minutes * 60
+    service_date = None
+    cursor = None
+    shipped = {}
+
+    with get_engine(source_name).connect() as connection:
+        while time.monotonic() < stop_at:
+            started = time.monotonic()
+
+            today = market_today(dataset_name)
+            if today != service_date:
+                purge_live_legs(pipeline, today)
+                service_date, cursor, shipped = today, None, {}
+
+            since = cursor - POLL_LOOKBACK if cursor else None
+            rows = poll_changed_legs(connection, source_name, service_date, since)
+            # End the read transaction so the next poll sees new commits
+            connection.rollback()
+
+            changed = [
+                row for row in rows
+                if shipped.get(tuple(row[name] for name in KEY_COLUMNS)) != row[CURSOR_COLUMN]
+            ]
+            if changed:
+                live_legs = dlt.resource(
+                    changed,
+                    name=LIVE_TABLE,
+                    primary_key=KEY_COLUMNS,
+                    columns={name: {"name": name, "nullable": True} for name in date_columns},
+                )
+                pipeline.run(merge_hints([live_legs]))
+                shipped.update((tuple(row[name] for name in KEY_COLUMNS), row[CURSOR_COLUMN]) for row in changed)
+
+            modified = [row[CURSOR_COLUMN] for row in rows if row[CURSOR_COLUMN] is not None]
+            if modified:
+                cursor = max([*modified, cursor] if cursor else modified)
+
+            logger.info(
+                f"{service_date}: {len(changed)} of {len(rows)} polled revisions merged "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+            time.sleep(max(0.0, poll_seconds - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    poll_live_legs("traumasoft_tn", "tn_database", run_minutes=5)
@@ -0,0 +1,107 @@
+"""
+Market Fan-Out
+
+Runs the same per-market flow for every Traumasoft market concurrently.
+
+Each market gets its own worker thread, so one slow source does not hold up
+the others and the all-markets wall time tracks the slowest single market.
+A failing market is logged and reported at the end instead of aborting the
+markets that are still running.
+"""
+
+import contextvars
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from zoneinfo import ZoneInfo
+
+from prefect.logging import get_run_logger
+
+
+# (dataset_name, source_name) for every market
+MARKETS = [
+    ("traumasoft_tn", "tn_database"),
+    ("traumasoft_mi", "mi_database"),
+    ("traumasoft_il", "il_database"),
+]
+
+DEFAULT_MAX_CONCURRENCY = len(MARKETS)
+
+# Local timezone of every market's service day, by dataset_name (the same
+# zones the dbt models convert to, e.g. stg_timesheet)
+MARKET_TIMEZONES = {
+    "traumasoft_tn": "America/Chicago",
+    "traumasoft_mi": "America/Detroit",
+    "traumasoft_il": "America/Chicago",
+}
+
+
+def market_today(dataset_name: str) -> datetime.date:
+    """Return the current service date in a market's local timezone."""
+    return datetime.datetime.now(ZoneInfo(MARKET_TIMEZONES[dataset_name])).date()
+
+
+def run_concurrently(
+    jobs: dict[str, Callable[[], None]],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> dict[str, BaseException]:
+    """Run independent jobs in a thread pool and collect their failures.
+
+    Each job runs in a copy of the caller's context so Prefect subflows and
+    logs stay attached to the parent flow run.
+
+    Args:
+        jobs: Mapping of job label to a zero-argument callable
+        max_concurrency: Maximum number of jobs running at once
+
+    Returns:
+        Mapping of job label to the exception it raised, for failed jobs only
+    """
+    logger = get_run_logger()
+    failures: dict[str, BaseException] = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = {
+            label: executor.submit(contextvars.copy_context().run, job)
+            for label, job in jobs.items()
+        }
+        for label, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"{label} failed: {e}")
+                failures[label] = e
+
+    return failures
+
+
+def run_for_markets(
+    market_flow: Callable[..., None],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    markets: list[tuple[str, str]] | None = None,
+    **kwargs,
+) -> None:
+    """Run a per-market flow for every market concurrently.
+
+    Args:
+        market_flow: Flow taking (dataset_name, source_name, **kwargs)
+        max_concurrency: Maximum number of markets loading at once
+        markets: (dataset_name, source_name) pairs, defaults to all markets
+        **kwargs: Extra keyword arguments passed to every market run
+
+    Raises:
+        RuntimeError: If any market failed, after all markets have finished
+    """
+    jobs = {
+        dataset_name: (
+            lambda dataset_name=dataset_name, source_name=source_name:
+            market_flow(dataset_name, source_name, **kwargs)
+        )
+        for dataset_name, source_name in (markets or MARKETS)
+    }
+
+    failures = run_concurrently(jobs, max_concurrency)
+    if failures:
+        raise RuntimeError(
+            f"{market_flow.__name__} failed for: {', '.join(sorted(failures))}"
+        )
@@ -0,0 +1,255 @@
+"""
+Pipeline Registry
+
+Stable, reused dlt pipelines for every flow. Each (flow, dataset) pair maps
+to one pipeline name, so its working directory, inferred schema and state
+persist between runs instead of being rebuilt by every 10-minute run.
+
+Every flow name is registered in PIPELINE_FLOWS. Old load packages are
+pruned each time a pipeline is opened, and working directories of names no
+registered flow and dataset build any more (e.g. the previous time-stamped
+cad_recent_traumasoft_tn_1735689600) are removed once per process.
+
+Merge loads pick a load mode per destination table (see merge_hints):
+- insert_values: dlt's default, multi-row INSERT statements into the
+  staging dataset followed by a delete-insert merge
+- copy_upsert: csv files streamed into the staging dataset with
+  COPY FROM STDIN, then merged with a single upsert statement keyed on the
+  table's primary key (e.g. leg_id, rev)
+"""
+
+import re
+import shutil
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import dlt
+from dlt.common.pipeline import LoadInfo
+from dlt.extract.exceptions import InvalidParallelResourceDataType
+from prefect import get_client
+from prefect.concurrency.sync import concurrency
+from prefect.logging import get_run_logger
+
+from flows.markets import MARKETS
+
+
+# Completed load packages kept per pipeline for debugging
+KEEP_LOADED_PACKAGES = 20
+
+# Flow names passed to get_pipeline, as patterns for the per-week pipelines
+# of schedule_flows.py and the per-chunk pipelines of chunks.py
+PIPELINE_FLOWS = [
+    r"attachments",
+    r"bigquery_export",
+    r"bigquery_export_manifest",
+    r"cad_backfill_\d{8}",
+    r"cad_cdc",
+    r"cad_live",
+    r"cad_monthly_\d{8}",
+    r"cad_recent",
+    r"cad_recent_ref",
+    r"cad_weekly",
+    r"cad_weekly_ref",
+    r"chunk_checkpoints",
+    r"daily_import",
+    r"export_batches",
+    r"schedule_monthly_timesheet",
+    r"schedule_monthly_w\d+",
+    r"schedule_recent",
+    r"schedule_snapshot",
+    r"schedule_weekly",
+]
+PIPELINE_FLOW = re.compile("|".join(PIPELINE_FLOWS))
+
+# Datasets of pipelines besides the market datasets: the BigQuery export
+# dataset and its manifest
+PIPELINE_DATASETS = [dataset_name for dataset_name, _ in MARKETS] + ["lan_analytics", "export_manifest"]
+
+# Working directories of any other pipeline name, e.g. the previous
+# time-stamped names, are removed once unused for this long
+STALE_PIPELINE_MIN_AGE_SECONDS = 24 * 3600
+
+LOAD_MODES = ["insert_values", "copy_upsert"]
+DEFAULT_LOAD_MODE = "insert_values"
+
+# Worker defaults for run_parallel. Extract workers are threads sharing the
+# source engine pool (flows/sources.py), normalize workers are processes.
+DEFAULT_EXTRACT_WORKERS = 4
+DEFAULT_NORMALIZE_WORKERS = 2
+DEFAULT_LOAD_WORKERS = 4
+
+_stale_pipelines_pruned = False
+_prune_lock = threading.Lock()
+
+
+def get_pipeline(
+    flow_name: str,
+    dataset_name: str,
+    destination: str = "postgres",
+    **kwargs,
+) -> dlt.Pipeline:
+    """Get the stable pipeline for a flow and dataset.
+
+    Args:
+        flow_name: Flow-specific pipeline prefix, e.g. cad_recent
+        dataset_name: Destination dataset, e.g. traumasoft_tn
+        destination: dlt destination name
+        **kwargs: Passed through to dlt.pipeline (staging, ...)
+
+    Raises:
+        ValueError: If flow_name is not registered in PIPELINE_FLOWS
+    """
+    if not PIPELINE_FLOW.fullmatch(flow_name):
+        raise ValueError(f"Pipeline flow '{flow_name}' is not registered in PIPELINE_FLOWS")
+
+    pipeline = dlt.pipeline(
+        pipeline_name=f"{flow_name}_{dataset_name}",
+        destination=destination,
+        dataset_name=dataset_name,
+        **kwargs,
+    )
+    prune_stale_pipelines(Path(pipeline.pipelines_dir))
+    prune_load_packages(pipeline)
+    return pipeline
+
+
+@contextmanager
+def exclusive_run(name: str) -> Iterator[None]:
+    """Hold the single slot of a global concurrency limit while the block runs.
+
+    A deployment's concurrency_limit only keeps runs of that one deployment
+    apart. Deployments sharing a stable pipeline or the same models (e.g. the
+    hourly and nightly BigQuery exports) wrap their work in the same name
+    instead. The limit is created with one slot on first use.
+    """
+    with get_client(sync_client=True) as client:
+        client.upsert_global_concurrency_limit_by_name(name, 1)
+    with concurrency(name, occupy=1, strict=True):
+        yield
+
+
+def prune_load_packages(pipeline: dlt.Pipeline, keep: int = KEEP_LOADED_PACKAGES) -> None:
+    """Delete all but the newest completed load packages of a pipeline."""
+    loaded_dir = Path(pipeline.working_dir) / "load" / "loaded"
+    load_ids = sorted(pipeline.list_completed_load_packages(), key=float)
+    for load_id in load_ids[:-keep] if keep else load_ids:
+        shutil.rmtree(loaded_dir / load_id, ignore_errors=True)
+
+
+def is_pipeline_in_use(pipeline_name: str) -> bool:
+    """Check whether a pipeline name is one get_pipeline still builds."""
+    return any(
+        pipeline_name.endswith(f"_{dataset_name}")
+        and PIPELINE_FLOW.fullmatch(pipeline_name.removesuffix(f"_{dataset_name}"))
+        for dataset_name in PIPELINE_DATASETS
+    )
+
+
+def prune_stale_pipelines(pipelines_dir: Path) -> None:
+    """Remove working directories of pipelines no longer in use, once per process."""
+    global _stale_pipelines_pruned
+    with _prune_lock:
+        if _stale_pipelines_pruned:
+            return
+        _stale_pipelines_pruned = True
+
+    if not pipelines_dir.exists():
+        return
+
+    cutoff = time.time() - STALE_PIPELINE_MIN_AGE_SECONDS
+    removed = 0
+    for path in pipelines_dir.iterdir():
+        if path.is_dir() and not is_pipeline_in_use(path.name) and path.stat().st_mtime < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+
+    if removed:
+        get_run_logger().info(f"Removed {removed} stale pipeline directories from {pipelines_dir}")
+
+
+def get_load_mode(table: str) -> str:
+    """Get the merge load mode for a destination table.
+
+    Set per table under [loading.modes] in .dlt/config.toml, falling back to
+    loading.default_mode and then DEFAULT_LOAD_MODE.
+    """
+    modes = dlt.config.get("loading.modes", dict) or {}
+    mode = modes.get(table) or dlt.config.get("loading.default_mode", str) or DEFAULT_LOAD_MODE
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown load mode '{mode}' for {table}, expected one of {LOAD_MODES}")
+    return mode
+
+
+def merge_hints(resources: list) -> list:
+    """Hint resources for a merge load using each table's load mode.
+
+    Use as pipeline.run(merge_hints(resources)) instead of passing
+    write_disposition="merge" to run, which would override the upsert
+    strategy of copy_upsert tables. copy_upsert tables need a primary key and
+    at most one row per key in each load.
+    """
+    for resource in resources:
+        apply_load_mode(resource, get_load_mode(resource.table_name))
+    return resources
+
+
+def apply_load_mode(resource, mode: str):
+    """Hint one resource for a merge load in the given load mode."""
+    if mode == "copy_upsert":
+        return resource.apply_hints(
+            write_disposition={"disposition": "merge", "strategy": "upsert"},
+            file_format="csv",
+        )
+    return resource.apply_hints(write_disposition="merge")
+
+
+def run_parallel(
+    pipeline: dlt.Pipeline,
+    resources: list,
+    extract_workers: int = DEFAULT_EXTRACT_WORKERS,
+    normalize_workers: int = DEFAULT_NORMALIZE_WORKERS,
+    load_workers: int = DEFAULT_LOAD_WORKERS,
+) -> LoadInfo:
+    """Run a pipeline extracting its resources in parallel.
+
+    Generator resources (every source_table) are extracted concurrently on
+    extract_workers threads; in-memory resources such as hash-diff deletes
+    stay on the main thread. The per-table extract times are logged before
+    normalize and load run with their own worker counts.
+    """
+    for resource in resources:
+        try:
+            resource.parallelize()
+        except InvalidParallelResourceDataType:
+            pass
+
+    pipeline.extract(resources, workers=extract_workers)
+    log_extract_times(pipeline)
+    pipeline.normalize(workers=normalize_workers)
+    return pipeline.load(workers=load_workers)
+
+
+def log_extract_times(pipeline: dlt.Pipeline) -> None:
+    """Log rows and seconds until the last write of each table in the last extract.
+
+    Tables are listed slowest first. With parallel extraction the seconds
+    are wall-clock from the start of the extract, so they include time spent
+    waiting for a worker.
+    """
+    logger = get_run_logger()
+    for step_metrics in pipeline.last_trace.last_extract_info.metrics.values():
+        for metrics in step_metrics:
+            started = metrics["started_at"].timestamp()
+            tables = sorted(
+                metrics["table_metrics"].items(),
+                key=lambda table: table[1].last_modified,
+                reverse=True,
+            )
+            for table_name, table_metrics in tables:
+                logger.info(
+                    f"Extracted {table_name}: {table_metrics.items_count} rows "
+                    f"in {table_metrics.last_modified - started:.1f}s"
+                )
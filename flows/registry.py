@@ -0,0 +1,182 @@
+"""
+Traumasoft Table Registry and Load Planner
+
+Every Traumasoft table loaded into the traumasoft_* datasets is declared
+once in TABLES: its key, how it is loaded, which flow owns it, the schedule
+tiers it is loaded in, and a priority and expected size per load.
+
+Flows build their resources from plan(flow, tier) instead of keeping their
+own table lists, so a table can only be extracted by its one owning flow.
+Declaring a table twice raises at import. The plan is cost-ordered: lower
+priority first, then the largest expected loads, so under parallel
+extraction the big tables start first.
+
+Strategies:
+- replace: full table replace (or hash-diff, see flows/daily_import.py)
+- merge: merge on key, windowed by window_column where the flow uses windows
+- incremental: merge on key, only rows past the persisted cursor column.
+  A cursor that is a key column is read by keyset, re-reading a window of
+  recent ids (see is_keyset).
+- append: append only
+"""
+
+from dataclasses import dataclass
+
+
+STRATEGIES = ("replace", "merge", "incremental", "append")
+
+# Schedule tiers, from prefect.yaml
+TIERS = ("recent", "weekly", "monthly", "daily")
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """How one Traumasoft table is loaded."""
+
+    name: str
+    flow: str
+    strategy: str
+    key: tuple[str, ...] = ()
+    # Incremental cursor, or the change column of a growing merge table
+    cursor: str | None = None
+    # Date column for the recent/weekly windows, and for the monthly window
+    window_column: str | None = None
+    monthly_window_column: str | None = None
+    tiers: tuple[str, ...] = ()
+    # Lower loads first; within a priority, larger expected loads first.
+    # expected_rows is a rough per-load estimate, only used for ordering.
+    priority: int = 1
+    expected_rows: int = 0
+    included_columns: tuple[str, ...] | None = None
+
+    @property
+    def is_keyset(self) -> bool:
+        """Whether the table is read incrementally on one of its key columns."""
+        return self.strategy == "incremental" and self.cursor in self.key
+
+    def __post_init__(self):
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"{self.name}: unknown strategy '{self.strategy}', expected one of {STRATEGIES}")
+        if self.strategy == "incremental" and not self.cursor:
+            raise ValueError(f"{self.name}: incremental tables need a cursor column")
+        unknown_tiers = set(self.tiers) - set(TIERS)
+        if unknown_tiers:
+            raise ValueError(f"{self.name}: unknown tiers {sorted(unknown_tiers)}, expected {TIERS}")
+
+
+# Tiers of the date-windowed CAD and schedule loads
+WINDOWED_TIERS = ("recent", "weekly", "monthly")
+
+TABLES: tuple[TableSpec, ...] = (
+    # CAD trip tables (flows/cad_import.py), date-windowed or incremental
+    TableSpec("cad_trip_legs_rev", "cad", "incremental", ("leg_id", "rev"), cursor="modified",
+              window_column="modified", monthly_window_column="leg_date",
+              tiers=WINDOWED_TIERS, priority=0, expected_rows=50000),
+    TableSpec("cad_trip_legs", "cad", "incremental", ("id",), cursor="created",
+              window_column="created", monthly_window_column="created",
+              tiers=WINDOWED_TIERS, priority=0, expected_rows=20000),
+    TableSpec("cad_trips", "cad", "merge", ("id",),
+              window_column="trip_date", monthly_window_column="trip_date",
+              tiers=WINDOWED_TIERS, priority=0, expected_rows=10000),
+    TableSpec("cad_trip_history_log", "cad", "incremental", ("id",), cursor="timestamp",
+              window_column="timestamp", monthly_window_column="timestamp",
+              tiers=WINDOWED_TIERS, priority=0, expected_rows=100000),
+
+    # CAD reference tables (flows/cad_import.py). merge tables keep growing
+    # and are merged by new keys plus rows past their change column.
+    TableSpec("epcr_v2_runs", "cad_reference", "merge", ("id",), cursor="finalize_date",
+              tiers=("recent", "weekly"), expected_rows=500000),
+    TableSpec("epcr_v2_cad_legs", "cad_reference", "merge", ("id",),
+              tiers=("recent", "weekly"), expected_rows=500000),
+    TableSpec("cad_trip_leg_shift_assignments", "cad_reference", "merge", ("id",),
+              tiers=("recent", "weekly"), expected_rows=500000),
+    TableSpec("cad_trip_cancel_reason", "cad_reference", "replace",
+              tiers=("recent", "weekly"), priority=2, expected_rows=100),
+    TableSpec("cad_lost_call_status", "cad_reference", "replace",
+              tiers=("recent", "weekly"), priority=2, expected_rows=100),
+
+    # Schedule tables (flows/schedule_flows.py, flows/timesheets.py)
+    TableSpec("sched_template_shift_assignments", "schedule", "merge", ("id",),
+              window_column="date_line", tiers=WINDOWED_TIERS, priority=0, expected_rows=20000),
+    TableSpec("timesheet", "schedule", "merge", ("time_id",),
+              window_column="date_created", tiers=WINDOWED_TIERS, priority=0, expected_rows=5000),
+
+    # Attachments (flows/attachments_flow.py)
+    TableSpec("attachments", "attachments", "incremental", ("id",), cursor="date",
+              tiers=("daily",), expected_rows=20000),
+    TableSpec("attachments_log", "attachments", "incremental", ("id",), cursor="timestamp",
+              tiers=("daily",), expected_rows=50000),
+    TableSpec("cad_trip_leg_attachments", "attachments", "incremental", ("id",), cursor="id",
+              tiers=("daily",), expected_rows=20000),
+    TableSpec("cad_trip_leg_attachment_types", "attachments", "incremental", ("trip_leg_attachment_id", "type_id"),
+              cursor="trip_leg_attachment_id", tiers=("daily",), expected_rows=20000),
+
+    # ePCR export batches (flows/export_batches.py), run on demand. Keyset
+    # incremental on their id, re-reading a window of recent ids.
+    TableSpec("epcr_v3_submit_batches", "export_batches", "incremental", ("id",), cursor="id",
+              expected_rows=1000),
+    TableSpec("epcr_v3_submit_batches_results", "export_batches", "incremental", ("batch_id",), cursor="batch_id",
+              expected_rows=1000),
+    TableSpec("epcr_v3_export_trigger_log", "export_batches", "incremental", ("id",), cursor="id",
+              expected_rows=5000),
+
+    # Nightly reference tables (flows/daily_import.py)
+    TableSpec("sched_unit_personnel", "daily_import", "replace", tiers=("daily",), priority=0, expected_rows=50000),
+    TableSpec("users", "daily_import", "replace", tiers=("daily",), priority=0, expected_rows=20000,
+              included_columns=("user_id", "employee_num", "employee_level", "employee_licensure", "username",
+                                "job_title", "job_title_id", "first_name", "last_name", "preferred_first_name",
+                                "email_address", "user_group", "user_division", "division", "disabled",
+                                "deactivated", "hourly_wage")),
+    TableSpec("sched_shifts", "daily_import", "replace", tiers=("daily",), expected_rows=5000),
+    TableSpec("sched_units", "daily_import", "replace", tiers=("daily",), expected_rows=2000),
+    TableSpec("sched_vehicles", "daily_import", "replace", tiers=("daily",), expected_rows=1000),
+    TableSpec("sched_unit_certification_templates", "daily_import", "replace", tiers=("daily",), expected_rows=1000),
+    TableSpec("sched_pay_periods", "daily_import", "replace", tiers=("daily",), expected_rows=500),
+    TableSpec("cost_centers", "daily_import", "replace", tiers=("daily",), expected_rows=200),
+    TableSpec("sched_earning_codes", "daily_import", "replace", tiers=("daily",), expected_rows=200),
+    TableSpec("user_job_titles", "daily_import", "replace", tiers=("daily",), expected_rows=200),
+    TableSpec("cad_reasons_for_transport", "daily_import", "replace", tiers=("daily",), expected_rows=200),
+    TableSpec("ibd_subzones", "daily_import", "replace", tiers=("daily",), expected_rows=200),
+    TableSpec("cad_sources", "daily_import", "replace", tiers=("daily",), expected_rows=200),
+    TableSpec("ibd_attachment_types", "daily_import", "replace", tiers=("daily",), expected_rows=100),
+    TableSpec("sched_unit_types", "daily_import", "replace", tiers=("daily",), expected_rows=50),
+    TableSpec("ibd_level_of_service", "daily_import", "replace", tiers=("daily",), expected_rows=50),
+)
+
+
+def _index_tables(tables: tuple[TableSpec, ...]) -> dict[str, TableSpec]:
+    """Index specs by table name, rejecting tables declared more than once."""
+    by_name = {}
+    for spec in tables:
+        if spec.name in by_name:
+            raise ValueError(
+                f"{spec.name} is declared by both {by_name[spec.name].flow} and {spec.flow}, "
+                f"each table must have one owning flow"
+            )
+        by_name[spec.name] = spec
+    return by_name
+
+
+TABLES_BY_NAME = _index_tables(TABLES)
+
+
+def table_spec(name: str) -> TableSpec:
+    """Return the spec of a registered table."""
+    return TABLES_BY_NAME[name]
+
+
+def plan(flow: str, tier: str | None = None) -> list[TableSpec]:
+    """Return the cost-ordered load plan of a flow, optionally for one tier.
+
+    Args:
+        flow: Owning flow, e.g. cad, cad_reference, daily_import
+        tier: Schedule tier (recent, weekly, monthly, daily), or None for
+              every table of the flow
+    """
+    if tier is not None and tier not in TIERS:
+        raise ValueError(f"Unknown tier '{tier}', expected one of {TIERS}")
+    specs = [
+        spec for spec in TABLES
+        if spec.flow == flow and (tier is None or tier in spec.tiers)
+    ]
+    return sorted(specs, key=lambda spec: (spec.priority, -spec.expected_rows))
@@ -0,0 +1,140 @@
+"""
+Source Value Sanitizer
+
+Traumasoft stores invalid values in its datetime/date columns: MySQL
+zero-dates (0000-00-00 00:00:00), zero month/day parts, and placeholder
+years far outside any real service date. pymysql hands the unparsable ones
+back as strings, which breaks typed loads into Postgres.
+
+make_sanitizer builds a map step for one reflected table that NULLs those
+values in every datetime/date column:
+- Arrow tables/batches (pyarrow, connectorx backends) are fixed with
+  vectorized pyarrow.compute kernels, one column at a time.
+- pandas DataFrames (pandas backend) use vectorized pandas conversions.
+- Row lists and dicts (sqlalchemy backend) only touch the known date
+  columns, in one loop per batch.
+
+source_table in flows/sources.py applies it to every Traumasoft resource as
+a batch step (flows/batch_columns.py), so it is called once per yielded
+item rather than once per row.
+"""
+
+import datetime
+from typing import Any, Callable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import Date, DateTime, Table
+
+# Values outside this year range are treated as invalid placeholders
+MIN_YEAR = 1900
+MAX_YEAR = 2100
+
+# Length of "YYYY-MM-DD HH:MM:SS", used to drop fractional seconds when a
+# string column has to be parsed strictly
+DATETIME_TEXT_LENGTH = 19
+
+
+def get_date_columns(table: Table) -> dict[str, bool]:
+    """Map each datetime/date column of a table to whether it carries a time part."""
+    return {
+        column.name: isinstance(column.type, DateTime)
+        for column in table.columns
+        if isinstance(column.type, (Date, DateTime))
+    }
+
+
+def _parse_text_dates(column: pa.Array, has_time: bool) -> pa.Array:
+    """Convert a string date column to timestamps, NULLing anything invalid."""
+    column = pc.if_else(pc.starts_with(column, "0000"), pa.scalar(None, column.type), column)
+    try:
+        return pc.cast(column, pa.timestamp("us"))
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # Zero month/day parts or other garbage: parse strictly, errors become NULL
+        text = pc.utf8_slice_codeunits(column, 0, DATETIME_TEXT_LENGTH if has_time else 10)
+        return pc.strptime(
+            text,
+            format="%Y-%m-%d %H:%M:%S" if has_time else "%Y-%m-%d",
+            unit="us",
+            error_is_null=True,
+        )
+
+
+def sanitize_arrow(item: pa.Table | pa.RecordBatch, date_columns: dict[str, bool]):
+    """NULL invalid values in the date columns of an Arrow table or batch."""
+    for name, has_time in date_columns.items():
+        index = item.schema.get_field_index(name)
+        if index < 0:
+            continue
+
+        column = item.column(index)
+        if isinstance(column, pa.ChunkedArray):
+            column = column.combine_chunks()
+
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            column = _parse_text_dates(column, has_time)
+            if not has_time:
+                column = column.cast(pa.date32())
+
+        if not (pa.types.is_timestamp(column.type) or pa.types.is_date(column.type)):
+            continue
+
+        years = pc.year(column)
+        out_of_range = pc.or_(pc.less(years, MIN_YEAR), pc.greater(years, MAX_YEAR))
+        if pc.any(out_of_range).as_py():
+            column = pc.if_else(out_of_range, pa.scalar(None, column.type), column)
+
+        item = item.set_column(index, pa.field(name, column.type, nullable=True), column)
+    return item
+
+
+def sanitize_dataframe(frame: pd.DataFrame, date_columns: dict[str, bool]) -> pd.DataFrame:
+    """NULL invalid values in the date columns of a pandas DataFrame."""
+    for name, has_time in date_columns.items():
+        if name not in frame.columns:
+            continue
+
+        column = pd.to_datetime(frame[name], errors="coerce")
+        column = column.where((column.dt.year >= MIN_YEAR) & (column.dt.year <= MAX_YEAR))
+        frame[name] = column if has_time else column.dt.date
+    return frame
+
+
+def sanitize_row(row: dict, date_columns: dict[str, bool]) -> dict:
+    """NULL invalid values in the date columns of a single row dict."""
+    for name in date_columns:
+        value = row.get(name)
+        if value is None:
+            continue
+        # pymysql only returns strings for values it could not parse
+        if isinstance(value, str) or (
+            isinstance(value, (datetime.date, datetime.datetime)) and not MIN_YEAR <= value.year <= MAX_YEAR
+        ):
+            row[name] = None
+    return row
+
+
+def make_sanitizer(table: Table) -> Callable[[Any], Any] | None:
+    """Build a map step sanitizing the date columns of a reflected table.
+
+    Returns None if the table has no datetime/date columns.
+    """
+    date_columns = get_date_columns(table)
+    if not date_columns:
+        return None
+
+    def sanitize(item):
+        if isinstance(item, (pa.Table, pa.RecordBatch)):
+            return sanitize_arrow(item, date_columns)
+        if isinstance(item, pd.DataFrame):
+            return sanitize_dataframe(item, date_columns)
+        if isinstance(item, list):
+            for row in item:
+                sanitize_row(row, date_columns)
+            return item
+        if isinstance(item, dict):
+            return sanitize_row(item, date_columns)
+        return item
+
+    return sanitize
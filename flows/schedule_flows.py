@@ -9,23 +9,27 @@ This module implements a tiered data reconciliation strategy for schedule data:
 
 Tables:
 - sched_template_shift_assignments (date_line)
-- timesheet (date_created)
+- timesheet (modification cursor or punch hash diff, see flows/timesheets.py)
 """
 
 import datetime
-import time
 from typing import Callable
 
-import dlt
-from dlt.sources.sql_database import sql_table
 from prefect import flow
 from prefect.logging import get_run_logger
 
+from flows.markets import DEFAULT_MAX_CONCURRENCY, run_for_markets
+from flows.pipelines import get_pipeline, merge_hints
+from flows.registry import plan
+from flows.schedule_snapshots import write_snapshot
+from flows.sources import source_table
+from flows.timesheets import TIMESHEET_TABLE, get_changed_timesheets, get_timesheet_cursor, timesheet_incremental
+
 
 # Date column mapping for filtered tables
+# Timesheets are windowed by flows/timesheets.py instead
 DATE_COLUMNS = {
-    "sched_template_shift_assignments": "date_line",
-    "timesheet": "date_created",
+    spec.name: spec.window_column for spec in plan("schedule") if spec.name != TIMESHEET_TABLE
 }
 
 
@@ -42,38 +46,26 @@ def create_date_filter(start_date: datetime.datetime, end_date: datetime.datetim
     return filter_by_date
 
 
-def get_schedule_tables(source_name: str, date_filter: Callable) -> list:
-    """Create the schedule tables with the given filter."""
-    schedule_table = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
+def get_schedule_table(source_name: str, date_filter: Callable):
+    """Create the schedule assignments table with the given filter."""
+    return source_table(
+        source_name,
         table="sched_template_shift_assignments",
         query_adapter_callback=date_filter,
     ).apply_hints(primary_key="id")
 
-    timesheet_table = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="timesheet",
-        query_adapter_callback=date_filter,
-    ).apply_hints(primary_key="time_id")
-
-    return [schedule_table, timesheet_table]
-
-
-def get_snapshot_table(source_name: str, date_filter: Callable, snapshot_week_start: datetime.date):
-    """Create the schedule table for snapshots with snapshot_week_start added."""
-
-    def add_snapshot_column(doc):
-        doc["snapshot_week_start"] = snapshot_week_start
-        return doc
-
-    schedule_table = sql_table(
-        credentials=dlt.secrets[f"sources.{source_name}.credentials"],
-        table="sched_template_shift_assignments",
-        query_adapter_callback=date_filter,
-    ).apply_hints(primary_key=["id", "snapshot_week_start"])
 
-    # Add the snapshot column to each record
-    return schedule_table.add_map(add_snapshot_column)
+def get_timesheet_tables(
+    pipeline,
+    source_name: str,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+) -> list:
+    """Create the timesheet resources holding new or changed punches in a window."""
+    logger = get_run_logger()
+    tables, changed, total = get_changed_timesheets(pipeline, source_name, start_date, end_date)
+    logger.info(f"Timesheet {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d}: {changed} of {total} punches new or changed")
+    return tables
 
 
 @flow
@@ -94,16 +86,18 @@ def load_schedule_recent(
 
     logger.info(f"Loading recent schedule data: {start_date} to {end_date}")
 
-    pipeline = dlt.pipeline(
-        pipeline_name=f"schedule_recent_{dataset_name}_{int(time.time())}",
-        destination='postgres',
-        dataset_name=dataset_name,
-    )
+    pipeline = get_pipeline("schedule_recent", dataset_name)
 
     date_filter = create_date_filter(start_date, end_date)
-    tables = get_schedule_tables(source_name, date_filter)
+    tables = [get_schedule_table(source_name, date_filter)]
+
+    cursor_column = get_timesheet_cursor(source_name)
+    if cursor_column:
+        tables.append(timesheet_incremental(source_name, cursor_column, start_date))
+    else:
+        tables += get_timesheet_tables(pipeline, source_name, start_date, end_date)
 
-    info = pipeline.run(tables, write_disposition="merge")
+    info = pipeline.run(merge_hints(tables))
     logger.info(f"Recent schedule load complete: {info}")
 
 
@@ -135,16 +129,13 @@ def load_schedule_weekly(
 
     logger.info(f"Loading weekly schedule data: {start_date} to {end_date}")
 
-    pipeline = dlt.pipeline(
-        pipeline_name=f"schedule_weekly_{dataset_name}_{int(time.time())}",
-        destination='postgres',
-        dataset_name=dataset_name,
-    )
+    pipeline = get_pipeline("schedule_weekly", dataset_name)
 
     date_filter = create_date_filter(start_date, end_date)
-    tables = get_schedule_tables(source_name, date_filter)
+    tables = [get_schedule_table(source_name, date_filter)]
+    tables += get_timesheet_tables(pipeline, source_name, start_date, end_date)
 
-    info = pipeline.run(tables, write_disposition="merge")
+    info = pipeline.run(merge_hints(tables))
     logger.info(f"Weekly schedule load complete: {info}")
 
 
@@ -156,6 +147,9 @@ def load_schedule_monthly(
     """
     Load schedule data for the last full month, processed week by week.
 
+    Timesheets are verified in one pass over the month: only punch hashes
+    are read from the source, and only new or changed punches are loaded.
+
     Intended to run on the 1st of each month at 0200.
     """
     logger = get_run_logger()
@@ -183,22 +177,27 @@ def load_schedule_monthly(
 
         logger.info(f"Processing week {week_num}: {current_start} to {week_end}")
 
-        pipeline = dlt.pipeline(
-            pipeline_name=f"schedule_monthly_w{week_num}_{dataset_name}_{int(time.time())}",
-            destination='postgres',
-            dataset_name=dataset_name,
-        )
+        pipeline = get_pipeline(f"schedule_monthly_w{week_num}", dataset_name)
 
         date_filter = create_date_filter(start_datetime, end_datetime)
-        tables = get_schedule_tables(source_name, date_filter)
+        schedule_table = get_schedule_table(source_name, date_filter)
 
-        info = pipeline.run(tables, write_disposition="merge")
+        info = pipeline.run(merge_hints([schedule_table]))
         logger.info(f"Week {week_num} complete: {info}")
 
         # Move to next week
         current_start = week_end + datetime.timedelta(days=1)
         week_num += 1
 
+    month_start = datetime.datetime.combine(first_of_prev_month, datetime.time.min)
+    month_end = datetime.datetime.combine(first_of_current_month, datetime.time.min)
+
+    pipeline = get_pipeline("schedule_monthly_timesheet", dataset_name)
+    timesheet_tables = get_timesheet_tables(pipeline, source_name, month_start, month_end)
+    if timesheet_tables:
+        info = pipeline.run(merge_hints(timesheet_tables))
+        logger.info(f"Monthly timesheet verification complete: {info}")
+
     logger.info(f"Monthly schedule load complete - processed {week_num - 1} weeks")
 
 
@@ -206,12 +205,19 @@ def load_schedule_monthly(
 def snapshot_schedule_weekly(
     dataset_name: str,
     source_name: str,
+    refresh: bool = True,
 ) -> None:
     """
     Take a snapshot of the upcoming week's schedule.
 
     Captures the schedule as it exists before the week starts, for comparison
-    with actuals later. Writes to sched_template_shift_assignments_snapshot table.
+    with actuals later. The snapshot is delta-encoded (see
+    flows/schedule_snapshots.py) and read back through the
+    sched_template_shift_assignments_snapshot view.
+
+    With refresh, the week's assignments are first merged into the live table
+    from the source, so the snapshot matches the source exactly rather than
+    the last 10-minute recent load.
 
     Intended to run Saturday at 2359.
     """
@@ -232,53 +238,41 @@ def snapshot_schedule_weekly(
 
     logger.info(f"Taking schedule snapshot for week: {next_sunday} to {next_saturday}")
 
-    pipeline = dlt.pipeline(
-        pipeline_name=f"schedule_snapshot_{dataset_name}_{int(time.time())}",
-        destination='postgres',
-        dataset_name=dataset_name,
-    )
-
-    date_filter = create_date_filter(start_date, end_date)
-    snapshot_table = get_snapshot_table(source_name, date_filter, next_sunday)
+    pipeline = get_pipeline("schedule_snapshot", dataset_name)
 
-    # Rename the table to the snapshot table name
-    snapshot_table.apply_hints(table_name="sched_template_shift_assignments_snapshot")
+    if refresh:
+        date_filter = create_date_filter(start_date, end_date)
+        schedule_table = get_schedule_table(source_name, date_filter)
+        info = pipeline.run(merge_hints([schedule_table]))
+        logger.info(f"Refreshed live schedule for the snapshot week: {info}")
 
-    info = pipeline.run(snapshot_table, write_disposition="append")
-    logger.info(f"Schedule snapshot complete: {info}")
+    rows = write_snapshot(pipeline, next_sunday, start_date, end_date)
+    logger.info(f"Schedule snapshot complete: {rows} assignments recorded for {next_sunday}")
 
 
 # Convenience flows for all regions
 @flow
-def load_all_schedule_recent() -> None:
-    """Load recent schedule data for all regions."""
-    load_schedule_recent("traumasoft_tn", "tn_database")
-    load_schedule_recent("traumasoft_mi", "mi_database")
-    load_schedule_recent("traumasoft_il", "il_database")
+def load_all_schedule_recent(max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+    """Load recent schedule data for all regions concurrently."""
+    run_for_markets(load_schedule_recent, max_concurrency)
 
 
 @flow
-def load_all_schedule_weekly() -> None:
-    """Load weekly schedule data for all regions."""
-    load_schedule_weekly("traumasoft_tn", "tn_database")
-    load_schedule_weekly("traumasoft_mi", "mi_database")
-    load_schedule_weekly("traumasoft_il", "il_database")
+def load_all_schedule_weekly(max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+    """Load weekly schedule data for all regions concurrently."""
+    run_for_markets(load_schedule_weekly, max_concurrency)
 
 
 @flow
-def load_all_schedule_monthly() -> None:
-    """Load monthly schedule data for all regions."""
-    load_schedule_monthly("traumasoft_tn", "tn_database")
-    load_schedule_monthly("traumasoft_mi", "mi_database")
-    load_schedule_monthly("traumasoft_il", "il_database")
+def load_all_schedule_monthly(max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+    """Load monthly schedule data for all regions concurrently."""
+    run_for_markets(load_schedule_monthly, max_concurrency)
 
 
 @flow
-def snapshot_all_schedule_weekly() -> None:
-    """Take weekly schedule snapshots for all regions."""
-    snapshot_schedule_weekly("traumasoft_tn", "tn_database")
-    snapshot_schedule_weekly("traumasoft_mi", "mi_database")
-    snapshot_schedule_weekly("traumasoft_il", "il_database")
+def snapshot_all_schedule_weekly(max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+    """Take weekly schedule snapshots for all regions concurrently."""
+    run_for_markets(snapshot_schedule_weekly, max_concurrency)
 
 
 if __name__ == "__main__":
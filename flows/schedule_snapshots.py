@@ -0,0 +1,305 @@
+"""
+Delta-Encoded Schedule Snapshots
+
+The weekly schedule snapshot used to append a full copy of every upcoming
+assignment to sched_template_shift_assignments_snapshot. Almost all of those
+rows stay identical to the live sched_template_shift_assignments row, so the
+store now keeps only what is needed to rebuild them:
+
+- sched_template_shift_assignments_snapshot_keys: one (snapshot_week_start,
+  id, row_hash) row per snapshotted assignment. row_hash is an md5 of the
+  row's hashed columns.
+- sched_template_shift_assignments_snapshot_columns: the hashed columns of
+  every snapshot week, i.e. the business columns of the live table when the
+  week was first snapshotted. Columns dlt adds to the live table later do not
+  change the hashes of earlier snapshots.
+- sched_template_shift_assignments_snapshot_versions: the hashed columns of a
+  row (jsonb), stored only when a snapshotted assignment diverges from the
+  live row. A deferred row trigger on the live table checks every updated or
+  deleted row at commit: if the old row matched a snapshot hash and the live
+  row with that id no longer does, the old version is copied in. Checking at
+  commit means a delete-insert merge, which deletes and re-inserts every row
+  of its window, only preserves rows it actually changed. A statement
+  trigger copies every snapshotted row before the live table is truncated
+  (dlt replace loads truncate it); versions equal to the live row again are
+  compacted away by the next snapshot.
+- sched_template_shift_assignments_snapshot: a view rebuilding every
+  week's snapshot with the business columns of the live table plus
+  snapshot_week_start. A row comes from the preserved version if there is
+  one, otherwise from the live row. The old full-copy table is renamed
+  to ..._snapshot_legacy on first use and unioned into the view. The view
+  reads the live table through a function, so it does not block dlt from
+  dropping or replacing the live table.
+
+Taking a snapshot is a single INSERT ... SELECT of keys and hashes from the
+live table. Unchanged rows use no extra storage beyond the key row.
+
+dlt runs a merge in one transaction, so the deferred trigger works with both
+load modes of flows/pipelines.py. Loads that drop the live table (dlt
+refresh, staging-optimized replace) lose the triggers until the next
+snapshot re-installs them, and the changed rows are not preserved.
+"""
+
+import datetime
+
+import dlt
+
+LIVE_TABLE = "sched_template_shift_assignments"
+KEYS_TABLE = "sched_template_shift_assignments_snapshot_keys"
+COLUMNS_TABLE = "sched_template_shift_assignments_snapshot_columns"
+VERSIONS_TABLE = "sched_template_shift_assignments_snapshot_versions"
+SNAPSHOT_VIEW = "sched_template_shift_assignments_snapshot"
+LEGACY_TABLE = "sched_template_shift_assignments_snapshot_legacy"
+
+# dlt bookkeeping columns change on every load and are never hashed
+DLT_COLUMNS = ("_dlt_load_id", "_dlt_id")
+
+# The hashed columns of a row, given a jsonb row and a text[] column list
+ROW_DATA = "{schema}.snapshot_row_data(to_jsonb({row}), {columns})"
+ROW_HASH = "md5(" + ROW_DATA + "::text)::uuid"
+
+
+def _names(client) -> dict[str, str]:
+    """Qualified names of the snapshot store objects in the client's dataset."""
+    return {
+        "schema": client.fully_qualified_dataset_name(),
+        "live": client.make_qualified_table_name(LIVE_TABLE),
+        "keys": client.make_qualified_table_name(KEYS_TABLE),
+        "columns": client.make_qualified_table_name(COLUMNS_TABLE),
+        "versions": client.make_qualified_table_name(VERSIONS_TABLE),
+        "view": client.make_qualified_table_name(SNAPSHOT_VIEW),
+        "legacy": client.make_qualified_table_name(LEGACY_TABLE),
+    }
+
+
+def _relation_kind(client, table_name: str) -> str | None:
+    """Return pg_class.relkind of a relation in the dataset, or None if missing."""
+    rows = client.execute_sql(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = %s AND c.relname = %s",
+        client.dataset_name,
+        table_name,
+    )
+    return rows[0][0] if rows else None
+
+
+def _live_columns(names: dict[str, str]) -> str:
+    """SQL selecting the business columns of the live table, as (name, type) rows in order."""
+    excluded = ", ".join(f"'{name}'" for name in DLT_COLUMNS)
+    return f"""
+        SELECT attname, format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = '{names['live']}'::regclass
+            AND attnum > 0 AND NOT attisdropped
+            AND attname NOT IN ({excluded})
+        ORDER BY attnum
+    """
+
+
+def install_snapshot_store(client) -> None:
+    """Create or update the store tables, the triggers and the snapshot view.
+
+    Idempotent. Needs the live table to exist, so run it after the first
+    schedule load into the dataset.
+    """
+    names = _names(client)
+    row_hash = {
+        row: ROW_HASH.format(schema=names["schema"], row=row, columns="snapshot.hashed_columns")
+        for row in ("OLD", "live")
+    }
+
+    if _relation_kind(client, SNAPSHOT_VIEW) == "r":
+        client.execute_sql(f"ALTER TABLE {names['view']} RENAME TO {LEGACY_TABLE}")
+
+    client.execute_sql(f"""
+        CREATE TABLE IF NOT EXISTS {names['keys']} (
+            snapshot_week_start date NOT NULL,
+            id bigint NOT NULL,
+            row_hash uuid NOT NULL,
+            PRIMARY KEY (snapshot_week_start, id)
+        );
+        CREATE INDEX IF NOT EXISTS {KEYS_TABLE}_id_idx ON {names['keys']} (id, row_hash);
+
+        CREATE TABLE IF NOT EXISTS {names['columns']} (
+            snapshot_week_start date PRIMARY KEY,
+            hashed_columns text[] NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS {names['versions']} (
+            id bigint NOT NULL,
+            row_hash uuid NOT NULL,
+            row_data jsonb NOT NULL,
+            preserved_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, row_hash)
+        );
+
+        -- Weeks snapshotted before the hashed columns were recorded hashed
+        -- every business column of the live table
+        INSERT INTO {names['columns']} (snapshot_week_start, hashed_columns)
+        SELECT DISTINCT keys.snapshot_week_start, ARRAY(SELECT attname FROM ({_live_columns(names)}) live_columns)
+        FROM {names['keys']} keys
+        ON CONFLICT (snapshot_week_start) DO NOTHING;
+
+        CREATE OR REPLACE FUNCTION {names['schema']}.snapshot_row_data(row_data jsonb, hashed_columns text[])
+        RETURNS jsonb LANGUAGE sql IMMUTABLE AS $$
+            SELECT COALESCE(jsonb_object_agg(key, value), '{{}}'::jsonb)
+            FROM jsonb_each(row_data)
+            WHERE key = ANY(hashed_columns)
+        $$;
+
+        -- The deferred trigger looks up live rows by id
+        CREATE INDEX IF NOT EXISTS {LIVE_TABLE}_id_idx ON {names['live']} (id);
+
+        CREATE OR REPLACE FUNCTION {names['schema']}.preserve_snapshot_assignment() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            snapshot record;
+        BEGIN
+            FOR snapshot IN
+                SELECT keys.row_hash, columns.hashed_columns
+                FROM {names['keys']} keys
+                JOIN {names['columns']} columns USING (snapshot_week_start)
+                WHERE keys.id = OLD.id
+            LOOP
+                CONTINUE WHEN {row_hash["OLD"]} <> snapshot.row_hash;
+                -- Runs at commit: a row deleted and re-inserted unchanged
+                -- still matches the snapshot
+                CONTINUE WHEN EXISTS (
+                    SELECT 1 FROM {names['live']} live
+                    WHERE live.id = OLD.id AND {row_hash["live"]} = snapshot.row_hash
+                );
+                INSERT INTO {names['versions']} (id, row_hash, row_data)
+                VALUES (OLD.id, snapshot.row_hash, {ROW_DATA.format(
+                    schema=names["schema"], row="OLD", columns="snapshot.hashed_columns")})
+                ON CONFLICT DO NOTHING;
+            END LOOP;
+            RETURN NULL;
+        END
+        $$;
+
+        -- Constraint triggers cannot be replaced in place
+        DROP TRIGGER IF EXISTS preserve_snapshot_assignments ON {names['live']};
+        CREATE CONSTRAINT TRIGGER preserve_snapshot_assignments
+        AFTER UPDATE OR DELETE ON {names['live']}
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION {names['schema']}.preserve_snapshot_assignment();
+
+        CREATE OR REPLACE FUNCTION {names['schema']}.preserve_truncated_snapshot_assignments() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO {names['versions']} (id, row_hash, row_data)
+            SELECT keys.id, keys.row_hash, {ROW_DATA.format(
+                schema=names["schema"], row="live", columns="snapshot.hashed_columns")}
+            FROM {names['keys']} keys
+            JOIN {names['columns']} snapshot USING (snapshot_week_start)
+            JOIN {names['live']} live ON live.id = keys.id
+            WHERE {row_hash["live"]} = keys.row_hash
+            ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END
+        $$;
+
+        CREATE OR REPLACE TRIGGER preserve_truncated_snapshot_assignments
+        BEFORE TRUNCATE ON {names['live']}
+        FOR EACH STATEMENT EXECUTE FUNCTION {names['schema']}.preserve_truncated_snapshot_assignments();
+
+        -- Dynamic SQL, so the view does not depend on the live table
+        CREATE OR REPLACE FUNCTION {names['schema']}.snapshot_live_rows()
+        RETURNS TABLE (id bigint, row_data jsonb) LANGUAGE plpgsql STABLE AS $$
+        BEGIN
+            RETURN QUERY EXECUTE 'SELECT live.id::bigint, to_jsonb(live) FROM {names['live']} live';
+        END
+        $$;
+    """)
+
+    legacy_rows = ""
+    if _relation_kind(client, LEGACY_TABLE) == "r":
+        legacy_rows = f"""
+            UNION ALL
+            SELECT legacy.snapshot_week_start, to_jsonb(legacy) AS row_data
+            FROM {names['legacy']} legacy
+        """
+
+    # Dropped and re-created so new live columns show up in the view
+    column_definitions = ", ".join(
+        f"{client.escape_column_name(name)} {data_type}"
+        for name, data_type in client.execute_sql(_live_columns(names))
+    )
+    client.execute_sql(f"""
+        DROP VIEW IF EXISTS {names['view']};
+        CREATE VIEW {names['view']} AS
+        WITH snapshot_rows AS (
+            SELECT keys.snapshot_week_start, COALESCE(versions.row_data, live.row_data) AS row_data
+            FROM {names['keys']} keys
+            LEFT JOIN {names['versions']} versions
+                ON versions.id = keys.id AND versions.row_hash = keys.row_hash
+            LEFT JOIN {names['schema']}.snapshot_live_rows() live
+                ON live.id = keys.id
+            {legacy_rows}
+        )
+        SELECT snapshot_row.*, snapshot_rows.snapshot_week_start
+        FROM snapshot_rows,
+            jsonb_to_record(snapshot_rows.row_data) AS snapshot_row({column_definitions});
+    """)
+
+
+def compact_snapshot_versions(client) -> None:
+    """Delete preserved versions that equal the live row again.
+
+    The snapshot view falls back to the live row, so such versions add
+    nothing. They are left behind by truncating loads, which preserve every
+    snapshotted row before the live table is emptied and re-filled.
+    """
+    names = _names(client)
+    row_hash = ROW_HASH.format(schema=names["schema"], row="live", columns="snapshot.hashed_columns")
+    client.execute_sql(f"""
+        DELETE FROM {names['versions']} versions
+        USING {names['keys']} keys
+        JOIN {names['columns']} snapshot USING (snapshot_week_start)
+        JOIN {names['live']} live ON live.id = keys.id
+        WHERE versions.id = keys.id
+            AND versions.row_hash = keys.row_hash
+            AND {row_hash} = versions.row_hash
+    """)
+
+
+def write_snapshot(
+    pipeline: dlt.Pipeline,
+    snapshot_week_start: datetime.date,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+) -> int:
+    """Record the live assignments of a week as a snapshot and return the row count.
+
+    Assignments already recorded for snapshot_week_start keep their first
+    snapshot, so re-running a snapshot only adds assignments that are new.
+    """
+    with pipeline.sql_client() as client, client.begin_transaction():
+        install_snapshot_store(client)
+        compact_snapshot_versions(client)
+        names = _names(client)
+        row_hash = ROW_HASH.format(schema=names["schema"], row="live", columns="snapshot.hashed_columns")
+        client.execute_sql(
+            f"""
+            INSERT INTO {names['columns']} (snapshot_week_start, hashed_columns)
+            SELECT %s, ARRAY(SELECT attname FROM ({_live_columns(names)}) live_columns)
+            ON CONFLICT (snapshot_week_start) DO NOTHING;
+
+            INSERT INTO {names['keys']} (snapshot_week_start, id, row_hash)
+            SELECT snapshot.snapshot_week_start, live.id, {row_hash}
+            FROM {names['live']} live
+            CROSS JOIN {names['columns']} snapshot
+            WHERE snapshot.snapshot_week_start = %s
+                AND live.date_line >= %s AND live.date_line < %s
+            ON CONFLICT (snapshot_week_start, id) DO NOTHING
+            """,
+            snapshot_week_start,
+            snapshot_week_start,
+            start_date,
+            end_date,
+        )
+        rows = client.execute_sql(
+            f"SELECT count(*) FROM {names['keys']} WHERE snapshot_week_start = %s",
+            snapshot_week_start,
+        )
+    return rows[0][0]
@@ -0,0 +1,182 @@
+"""
+Source Engine Registry
+
+Process-wide SQLAlchemy engines, connection pools and reflected table
+metadata, keyed by source name (e.g. tn_database, local_postgres).
+
+Every flow module builds its dlt resources through source_table, so a flow
+run opens a small fixed pool of connections per source and reflects each
+table once, instead of creating an engine and reflecting the schema for
+every resource.
+"""
+
+import json
+import threading
+from pathlib import Path
+
+import dlt
+from dlt.common.configuration.specs import ConnectionStringCredentials
+from dlt.sources.sql_database import sql_table
+from dlt.sources.sql_database.helpers import engine_from_credentials
+from sqlalchemy import MetaData, Table
+from sqlalchemy.engine import Engine
+
+from flows.batch_columns import MapBatch
+from flows.sanitize import get_date_columns, make_sanitizer
+
+# Connection pool settings, shared by every flow using a source
+POOL_SIZE = 5
+MAX_OVERFLOW = 5
+POOL_RECYCLE_SECONDS = 3600
+
+# Extraction backends supported by sql_table. pyarrow, pandas and connectorx
+# yield columnar batches instead of one Python dict per row.
+BACKENDS = ("sqlalchemy", "pyarrow", "pandas", "connectorx")
+DEFAULT_BACKEND = "sqlalchemy"
+DEFAULT_CHUNK_SIZE = 50000
+
+# Ids re-read behind an id cursor, to pick up recently changed tail rows
+DEFAULT_RECHECK_WINDOW = 1000
+
+# Column projections for wide tables, generated from dbt column usage by
+# tools/generate_included_columns.py. Tables not listed load every column.
+INCLUDED_COLUMNS_FILE = Path(__file__).with_name("included_columns.json")
+INCLUDED_COLUMNS: dict[str, list[str]] = (
+    json.loads(INCLUDED_COLUMNS_FILE.read_text()) if INCLUDED_COLUMNS_FILE.exists() else {}
+)
+
+_engines: dict[str, Engine] = {}
+_metadata: dict[str, MetaData] = {}
+_reflection_locks: dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def get_engine(source_name: str) -> Engine:
+    """Get the shared engine for a source, creating it on first use."""
+    with _registry_lock:
+        engine = _engines.get(source_name)
+        if engine is None:
+            credentials = dlt.secrets.get(f"sources.{source_name}.credentials", ConnectionStringCredentials)
+            engine = engine_from_credentials(
+                credentials,
+                may_dispose_after_use=False,
+                pool_size=POOL_SIZE,
+                max_overflow=MAX_OVERFLOW,
+                pool_recycle=POOL_RECYCLE_SECONDS,
+                pool_pre_ping=True,
+            )
+            _engines[source_name] = engine
+            _metadata[source_name] = MetaData()
+            _reflection_locks[source_name] = threading.Lock()
+        return engine
+
+
+def get_metadata(source_name: str) -> MetaData:
+    """Get the shared MetaData holding the reflected tables of a source."""
+    get_engine(source_name)
+    return _metadata[source_name]
+
+
+def reflect_table(source_name: str, table_name: str) -> Table:
+    """Reflect a source table once per process and return the cached Table."""
+    engine = get_engine(source_name)
+    metadata = _metadata[source_name]
+    with _reflection_locks[source_name]:
+        table = metadata.tables.get(table_name)
+        if table is None:
+            table = Table(table_name, metadata, autoload_with=engine)
+        return table
+
+
+def get_backend(table: str) -> str:
+    """Get the extraction backend for a table.
+
+    Set per table under [extraction.backends] in .dlt/config.toml, falling back
+    to extraction.default_backend and then DEFAULT_BACKEND.
+    """
+    backends = dlt.config.get("extraction.backends", dict) or {}
+    backend = backends.get(table) or dlt.config.get("extraction.default_backend", str) or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown extraction backend '{backend}' for {table}, expected one of {BACKENDS}")
+    return backend
+
+
+def get_chunk_size(table: str) -> int:
+    """Get the extraction chunk size for a table.
+
+    Set per table under [extraction.chunk_sizes], falling back to
+    extraction.chunk_size and then DEFAULT_CHUNK_SIZE.
+    """
+    chunk_sizes = dlt.config.get("extraction.chunk_sizes", dict) or {}
+    return int(chunk_sizes.get(table) or dlt.config.get("extraction.chunk_size", int) or DEFAULT_CHUNK_SIZE)
+
+
+def get_recheck_window(table: str) -> int:
+    """Get how many ids behind its id cursor a table is re-read.
+
+    Set per table under [extraction.recheck_windows], falling back to
+    extraction.recheck_window and then DEFAULT_RECHECK_WINDOW.
+    """
+    windows = dlt.config.get("extraction.recheck_windows", dict) or {}
+    window = windows.get(table)
+    if window is None:
+        window = dlt.config.get("extraction.recheck_window", int)
+    return int(DEFAULT_RECHECK_WINDOW if window is None else window)
+
+
+def source_table(source_name: str, table: str, sanitize: bool = True, **kwargs):
+    """Create a sql_table resource on the shared engine and reflected metadata.
+
+    The backend and chunk size come from the extraction config, and the
+    columns from INCLUDED_COLUMNS, unless passed explicitly. Invalid values
+    in datetime/date columns are NULLed by the sanitizer in flows/sanitize.py,
+    and those columns are hinted nullable.
+
+    Args:
+        source_name: Name of the source configuration
+        table: Name of the table to load
+        sanitize: Apply the date sanitizer (on by default for Traumasoft tables)
+        **kwargs: Passed through to sql_table (query_adapter_callback, incremental, ...)
+    """
+    table_obj = reflect_table(source_name, table)
+    metadata = get_metadata(source_name)
+    kwargs.setdefault("backend", get_backend(table))
+    kwargs.setdefault("chunk_size", get_chunk_size(table))
+    if kwargs.get("included_columns") is None:
+        kwargs["included_columns"] = INCLUDED_COLUMNS.get(table)
+    if kwargs["included_columns"] is not None:
+        # sql_table drops excluded columns from the Table in place, so project
+        # a copy and keep the shared reflection intact
+        metadata = MetaData()
+        table_obj.to_metadata(metadata)
+
+    resource = sql_table(
+        credentials=get_engine(source_name),
+        metadata=metadata,
+        table=table,
+        **kwargs,
+    )
+
+    sanitizer = make_sanitizer(table_obj) if sanitize else None
+    if sanitizer:
+        # Run right after extraction so every later step sees clean values,
+        # once per batch instead of once per row
+        resource.add_step(MapBatch(sanitizer), insert_at=1)
+        included_columns = kwargs["included_columns"]
+        resource.apply_hints(columns={
+            name: {"name": name, "nullable": True}
+            for name in get_date_columns(table_obj)
+            if included_columns is None or name in included_columns
+        })
+
+    return resource
+
+
+def dispose_engines() -> None:
+    """Close every pooled connection, e.g. at the end of a long-lived worker."""
+    with _registry_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _metadata.clear()
+        _reflection_locks.clear()
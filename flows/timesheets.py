@@ -0,0 +1,151 @@
+"""
+Edit-Aware Timesheet Extraction
+
+Punches are edited long after they are created, so filtering timesheet by
+date_created alone forced the weekly and monthly reconciliations to re-pull
+whole periods just to catch those edits. Timesheets are now loaded in one of
+two ways:
+
+- Modification cursor: if the source table has one of CURSOR_COLUMNS, the
+  recent load is incremental on it, like the CAD cursors in
+  flows/cad_import.py.
+- Hash diff: for a date_created window, MySQL computes an md5 of every
+  column per time_id, and only (time_id, hash) travels. The hashes are
+  compared with the ones stored in the timesheet_punch_hashes table of the
+  warehouse, and only new or changed punches are fetched and merged.
+
+The weekly and monthly tiers always run the hash diff, which makes them a
+cheap verification pass. With a cursor, punches the recent load already
+merged show up as changed once, because the recent load does not record
+hashes, and are re-merged unchanged. The first pass over a window fetches
+it fully to seed the stored hashes.
+"""
+
+import datetime
+
+import dlt
+from dlt.destinations.exceptions import DatabaseUndefinedRelation
+from sqlalchemy import String, cast, func, select
+
+from flows.registry import table_spec
+from flows.sources import get_engine, reflect_table, source_table
+
+
+TIMESHEET_TABLE = "timesheet"
+HASH_TABLE = "timesheet_punch_hashes"
+KEY_COLUMN = table_spec(TIMESHEET_TABLE).key[0]
+DATE_COLUMN = table_spec(TIMESHEET_TABLE).window_column
+
+# Modification columns used as the recent cursor if the source has one
+CURSOR_COLUMNS = ["modified", "date_modified", "last_modified", "updated_at"]
+
+# Re-read this far behind the cursor to catch rows committed out of order
+CURSOR_LOOKBACK = datetime.timedelta(minutes=15)
+
+# Above this many changed punches the window is fetched by date instead of
+# by a time_id IN (...) list
+MAX_KEYED_FETCH = 5000
+
+
+def get_timesheet_cursor(source_name: str) -> str | None:
+    """Return the modification column of the source timesheet table, if any."""
+    columns = reflect_table(source_name, TIMESHEET_TABLE).columns
+    return next((name for name in CURSOR_COLUMNS if name in columns), None)
+
+
+def timesheet_incremental(source_name: str, cursor_column: str, initial_value: datetime.datetime):
+    """Create the timesheet resource, incremental on its modification column."""
+    return source_table(
+        source_name,
+        table=TIMESHEET_TABLE,
+        incremental=dlt.sources.incremental(
+            cursor_column,
+            initial_value=initial_value,
+            lag=CURSOR_LOOKBACK.total_seconds(),
+        ),
+    ).apply_hints(primary_key=KEY_COLUMN)
+
+
+def get_source_hashes(
+    source_name: str,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+) -> dict:
+    """Return {time_id: (hash, date_created)} for the source punches in a window."""
+    table = reflect_table(source_name, TIMESHEET_TABLE)
+    punch_hash = func.md5(func.concat_ws(
+        "|", *[func.coalesce(cast(column, String), "\\N") for column in table.columns]
+    ))
+    query = select(table.c[KEY_COLUMN], punch_hash, table.c[DATE_COLUMN]).where(
+        (table.c[DATE_COLUMN] >= start_date) & (table.c[DATE_COLUMN] < end_date)
+    )
+    with get_engine(source_name).connect() as connection:
+        return {row[0]: (row[1], row[2]) for row in connection.execute(query)}
+
+
+def get_loaded_hashes(
+    pipeline: dlt.Pipeline,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+) -> dict:
+    """Return {time_id: hash} recorded in the warehouse for a window."""
+    try:
+        with pipeline.sql_client() as client:
+            table = client.make_qualified_table_name(HASH_TABLE)
+            rows = client.execute_sql(
+                f"SELECT {KEY_COLUMN}, punch_hash FROM {table} "
+                f"WHERE {DATE_COLUMN} >= %s AND {DATE_COLUMN} < %s",
+                start_date,
+                end_date,
+            )
+    except DatabaseUndefinedRelation:
+        return {}
+    return dict(rows or [])
+
+
+def get_changed_timesheets(
+    pipeline: dlt.Pipeline,
+    source_name: str,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+) -> tuple[list, int, int]:
+    """Diff source and warehouse punch hashes for a window.
+
+    Returns:
+        (resources, changed, total): the timesheet and hash resources to merge
+        (empty if nothing changed), the number of new or changed punches and
+        the number of punches in the window
+    """
+    source_hashes = get_source_hashes(source_name, start_date, end_date)
+    loaded_hashes = get_loaded_hashes(pipeline, start_date, end_date)
+    changed = [
+        time_id for time_id, (punch_hash, _) in source_hashes.items()
+        if loaded_hashes.get(time_id) != punch_hash
+    ]
+    if not changed:
+        return [], 0, len(source_hashes)
+
+    if len(changed) > MAX_KEYED_FETCH:
+        def filter_punches(query, table):
+            return query.where(
+                (table.c[DATE_COLUMN] >= start_date) & (table.c[DATE_COLUMN] < end_date)
+            )
+    else:
+        def filter_punches(query, table):
+            return query.where(table.c[KEY_COLUMN].in_(changed))
+
+    timesheet = source_table(
+        source_name,
+        table=TIMESHEET_TABLE,
+        query_adapter_callback=filter_punches,
+    ).apply_hints(primary_key=KEY_COLUMN)
+
+    hashes = dlt.resource(
+        [
+            {KEY_COLUMN: time_id, "punch_hash": source_hashes[time_id][0], DATE_COLUMN: source_hashes[time_id][1]}
+            for time_id in changed
+        ],
+        name=HASH_TABLE,
+        primary_key=KEY_COLUMN,
+    )
+    return [timesheet, hashes], len(changed), len(source_hashes)
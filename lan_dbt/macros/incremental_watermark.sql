@@ -0,0 +1,20 @@
+{% macro has_incremental_column(column_name) %}
+{#- Whether an incremental run can read its watermark column from {{ this }}.
+    A table built before the model tracked the column (e.g. by a former table
+    materialization) only gets it from on_schema_change after the pre-hooks
+    ran, so such a run has to be a full build instead. -#}
+{% if not is_incremental() %}
+    {{ return(false) }}
+{% endif %}
+{% set column_names = adapter.get_columns_in_relation(this) | map(attribute='name') | map('lower') | list %}
+{{ return(column_name | lower in column_names) }}
+{% endmacro %}
+
+
+{% macro delete_without_incremental_column(column_name) %}
+{#- pre_hook of incremental models with a watermark column: empties a table
+    without the column, so the full build that follows replaces every row -#}
+{% if is_incremental() and not has_incremental_column(column_name) %}
+delete from {{ this }}
+{% endif %}
+{% endmacro %}
@@ -0,0 +1,148 @@
+{#
+    Changed legs of int_run_crew_assignments.
+
+    cad_trip_leg_shift_assignments is replaced in full by the CAD import, so
+    its _dlt_load_id changes on every load and says nothing about which links
+    changed. The crew links the model was last built from are kept in
+    <model>_links instead, and compared with the source links by content.
+
+    The pre_hook reads the source links once into a temporary table and
+    computes the changed legs once into another, which both its delete and
+    the model's select read. The post_hook stores that same copy of the
+    source links, so a link replaced during the build is seen as changed by
+    the next run.
+#}
+
+{% macro run_crew_links_relation() %}
+{{ return(api.Relation.create(database=this.database, schema=this.schema, identifier=this.identifier ~ '_links')) }}
+{% endmacro %}
+
+
+{% macro run_crew_changed_legs_relation() %}
+{{ return('run_crew_changed_legs') }}
+{% endmacro %}
+
+
+{% macro run_crew_source_links_relation() %}
+{{ return('run_crew_source_links') }}
+{% endmacro %}
+
+
+{% macro run_crew_source_links(datasets) %}
+{% for dataset in datasets %}
+{% set suffix=dataset.split('_')[1] %}
+        select distinct '{{ suffix }}' as source_database, la.leg_id, la.shift_assignment_id
+        from {{ source(dataset, 'cad_trip_leg_shift_assignments') }} as la
+{% if not loop.last %}
+        union all
+{% endif %}
+{% endfor %}
+{% endmacro %}
+
+
+{% macro run_crew_changed_legs(datasets) %}
+{% set lookback_days = var('int_run_crew_assignments_lookback_days', 3) %}
+{% set load_overlap_hours = var('int_run_crew_assignments_load_overlap_hours', 6) %}
+{% set links = run_crew_links_relation() %}
+with run_crew_watermarks as (
+        select
+            source_database,
+            max(run_modified_timestamp) as run_modified_timestamp,
+            -- Less the overlap for loads still running when the newest committed
+            max(_source_load_id)::numeric - {{ load_overlap_hours }} * 3600 as source_load_id
+        from {{ this }}
+        group by source_database
+    ),
+
+    source_links as (
+        select * from {{ run_crew_source_links_relation() }}
+    ),
+
+    -- Crew links added or removed since the last build
+    changed_links as (
+        (
+            select source_database, leg_id, shift_assignment_id from source_links
+            except
+            select source_database, leg_id, shift_assignment_id from {{ links }}
+        )
+        union
+        (
+            select source_database, leg_id, shift_assignment_id from {{ links }}
+            except
+            select source_database, leg_id, shift_assignment_id from source_links
+        )
+    )
+
+    select source_database, leg_id from changed_links
+
+{% for dataset in datasets %}
+{% set suffix=dataset.split('_')[1] %}
+    union
+
+    -- Legs with a revision modified since the last build
+    select '{{ suffix }}' as source_database, rev.leg_id
+    from {{ source(dataset, 'cad_trip_legs_rev') }} as rev
+    where rev.modified > coalesce(
+        (select run_modified_timestamp from run_crew_watermarks where source_database = '{{ suffix }}'),
+        '-infinity'
+    )
+
+    union
+
+    -- Legs whose shift assignments were loaded since the last build, and legs
+    -- with recent shifts to pick up clock-ins and clock-outs
+    select '{{ suffix }}' as source_database, la.leg_id
+    from {{ source(dataset, 'cad_trip_leg_shift_assignments') }} as la
+    inner join {{ source(dataset, 'sched_template_shift_assignments') }} as stsa
+        on stsa.id = la.shift_assignment_id
+    where stsa._dlt_load_id::numeric > coalesce(
+            (select source_load_id from run_crew_watermarks where source_database = '{{ suffix }}'),
+            0
+        )
+        or stsa.date_line >= current_date - {{ lookback_days }}
+{% endfor %}
+{% endmacro %}
+
+
+{% macro prepare_run_crew_changed_legs(datasets) %}
+drop table if exists {{ run_crew_source_links_relation() }};
+create temporary table {{ run_crew_source_links_relation() }} on commit drop as
+{{ run_crew_source_links(datasets) }};
+
+{% if has_incremental_column('_source_load_id') %}
+{% set links = run_crew_links_relation() %}
+create table if not exists {{ links }} (
+    source_database text,
+    leg_id bigint,
+    shift_assignment_id bigint
+);
+
+drop table if exists {{ run_crew_changed_legs_relation() }};
+create temporary table {{ run_crew_changed_legs_relation() }} on commit drop as
+{{ run_crew_changed_legs(datasets) }};
+
+delete from {{ this }} as t
+where (t.source_database, t.leg_id) in (
+        select source_database, leg_id from {{ run_crew_changed_legs_relation() }}
+    )
+    -- Shifts that left the 30-day window of stg_schedule
+    or t.shift_date < current_date - interval '30 days'
+{% elif is_incremental() %}
+-- No watermark yet, every row is rebuilt
+delete from {{ this }}
+{% endif %}
+{% endmacro %}
+
+
+{% macro save_run_crew_links(datasets) %}
+{% set links = run_crew_links_relation() %}
+create table if not exists {{ links }} (
+    source_database text,
+    leg_id bigint,
+    shift_assignment_id bigint
+);
+
+delete from {{ links }};
+insert into {{ links }} (source_database, leg_id, shift_assignment_id)
+select source_database, leg_id, shift_assignment_id from {{ run_crew_source_links_relation() }}
+{% endmacro %}
@@ -1,18 +1,54 @@
+{% set datasets=['traumasoft_tn', 'traumasoft_mi', 'traumasoft_il'] %}
+{% set incremental = has_incremental_column('_source_load_id') %}
+
 {{ config(
-    materialized='table',
+    materialized='incremental',
+    incremental_strategy='delete+insert',
     unique_key=['leg_id', 'source_database', 'shift_assignment_id'],
-    on_schema_change='sync_all_columns'
+    on_schema_change='sync_all_columns',
+    pre_hook="{{ prepare_run_crew_changed_legs(" ~ datasets ~ ") }}",
+    post_hook="{{ save_run_crew_links(" ~ datasets ~ ") }}"
 ) }}
 
-{% set datasets=['traumasoft_tn', 'traumasoft_mi', 'traumasoft_il'] %}
+/*
+    Runs with their crew shift assignments, for time on task metrics.
+
+    Incremental processing:
+    - Incremental runs rebuild the changed legs (macros/run_crew_changed_legs.sql):
+      legs with cad_trip_legs_rev.modified after the newest run_modified_timestamp
+      already built, legs with crew links added or removed since the last build
+      (compared by content with int_run_crew_assignments_links), legs whose shift
+      assignments were loaded after the newest _source_load_id (less
+      int_run_crew_assignments_load_overlap_hours, for long loads committing after
+      shorter ones), and legs with shifts in the last
+      int_run_crew_assignments_lookback_days days.
+    - The pre_hook computes those legs once into a temporary table and deletes
+      every row of them before they are rebuilt from the same set, so stale crew
+      links and legs that no longer qualify are removed, together with shifts that
+      left the 30-day window of stg_schedule.
+    - A table without _source_load_id yet (built before this model was
+      incremental) is emptied by the pre_hook and rebuilt in full.
+    - Cost center and user changes of older shifts need
+      dbt build --full-refresh -s int_run_crew_assignments.
+*/
 
 with
     run_timestamps as (
         select * from {{ ref('stg_run_timestamps') }}
+        {% if incremental %}
+        where (source_database, leg_id) in (
+            select source_database, leg_id from {{ run_crew_changed_legs_relation() }}
+        )
+        {% endif %}
     ),
 
     runs as (
         select * from {{ ref('stg_runs') }}
+        {% if incremental %}
+        where (source_database, leg_id) in (
+            select source_database, leg_id from {{ run_crew_changed_legs_relation() }}
+        )
+        {% endif %}
     ),
 
     -- Use macro to get valid cost centers for crew shifts
@@ -26,10 +62,15 @@ with
 {% set suffix=dataset.split('_')[1] %}
     {{ suffix }}_leg_assignments as (
         select
-            leg_id,
-            shift_assignment_id,
-            '{{ suffix }}' as source_database
-        from {{ source(dataset, 'cad_trip_leg_shift_assignments') }}
+            la.leg_id,
+            la.shift_assignment_id,
+            '{{ suffix }}' as source_database,
+            -- The links table is replaced on every load, so only the shift
+            -- assignment's load id is a watermark
+            stsa._dlt_load_id as _source_load_id
+        from {{ source(dataset, 'cad_trip_leg_shift_assignments') }} as la
+        left join {{ source(dataset, 'sched_template_shift_assignments') }} as stsa
+            on stsa.id = la.shift_assignment_id
     ){% if not loop.last %},{% endif %}
 {% endfor %},
 
@@ -133,7 +174,8 @@ with
 
             -- Metadata
             r.created_timestamp as run_created_timestamp,
-            r.modified_timestamp as run_modified_timestamp
+            r.modified_timestamp as run_modified_timestamp,
+            la._source_load_id
 
         from runs as r
         inner join run_timestamps as rt
@@ -1,4 +1,12 @@
-{{ config(materialized='table') }}
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key=['source_database', 'date_line'],
+        on_schema_change='append_new_columns',
+        pre_hook="{{ delete_without_incremental_column('_source_load_id') }}"
+    )
+}}
 
 /*
     Staging model for timesheets joined to schedule assignments.
@@ -19,9 +27,31 @@
 
     No date filtering - contains all historical data.
     Downstream models (stg_schedule, stg_schedule_full) apply date filters as needed.
+
+    Incremental processing:
+    - Incremental runs rebuild whole days (source_database, date_line): the
+      dates of punches and assignments loaded since the newest _dlt_load_id
+      already processed, the dates those rows were on before, and the last
+      stg_timesheet_lookback_days days.
+    - Load ids are the start time of a load, so a long load can commit after
+      a shorter one with a newer id. Rows loaded within
+      stg_timesheet_load_overlap_hours before the newest id are picked up
+      again; the weekly full refresh covers loads running even longer.
+    - Fuzzy matches cross midnight, so every such date is widened by
+      stg_timesheet_fuzzy_match_days on both sides.
+    - Rebuilt days are replaced whole (delete+insert), so rows that no
+      longer match are removed.
+    - A table without _source_load_id yet (built before this model was
+      incremental) is emptied by the pre_hook and rebuilt in full.
+    - User changes (e.g. username) only reach rows on rebuilt days; run
+      dbt build --full-refresh -s stg_timesheet to rebuild everything.
 */
 
 {% set datasets=['traumasoft_tn', 'traumasoft_mi', 'traumasoft_il'] %}
+{% set lookback_days = var('stg_timesheet_lookback_days', 3) %}
+{% set fuzzy_match_days = var('stg_timesheet_fuzzy_match_days', 1) %}
+{% set load_overlap_hours = var('stg_timesheet_load_overlap_hours', 6) %}
+{% set incremental = has_incremental_column('_source_load_id') %}
 
 WITH
 {% for dataset in datasets %}
@@ -32,6 +62,52 @@ WITH
 {% set local_tz = 'America/Chicago' %}
 {% endif %}
 
+{% if incremental %}
+-- Newest source load already processed for this market, less the overlap for
+-- loads still running when it committed
+{{ suffix }}_watermark AS (
+    SELECT COALESCE(MAX(_source_load_id)::numeric, 0) - {{ load_overlap_hours }} * 3600 AS load_id
+    FROM {{ this }}
+    WHERE source_database = '{{ suffix }}'
+),
+
+{{ suffix }}_changed_assignments AS (
+    SELECT stsa.id, stsa.date_line
+    FROM {{ source(dataset, 'sched_template_shift_assignments') }} AS stsa
+    WHERE stsa._dlt_load_id::numeric > (SELECT load_id FROM {{ suffix }}_watermark)
+),
+
+{{ suffix }}_changed_timesheets AS (
+    SELECT ts.time_id, (TO_TIMESTAMP(ts.time_start_ts) AT TIME ZONE '{{ local_tz }}')::date AS punch_date
+    FROM {{ source(dataset, 'timesheet') }} AS ts
+    WHERE ts._dlt_load_id::numeric > (SELECT load_id FROM {{ suffix }}_watermark)
+),
+
+{{ suffix }}_changed_dates AS (
+    SELECT date_line AS changed_date FROM {{ suffix }}_changed_assignments
+    UNION
+    SELECT punch_date FROM {{ suffix }}_changed_timesheets
+    UNION
+    -- Dates the changed rows were on before, in case they moved
+    SELECT t.date_line
+    FROM {{ this }} AS t
+    WHERE t.source_database = '{{ suffix }}'
+        AND (
+            t.assignment_id IN (SELECT id FROM {{ suffix }}_changed_assignments)
+            OR t.time_id IN (SELECT time_id FROM {{ suffix }}_changed_timesheets)
+        )
+    UNION
+    SELECT recent_date::date
+    FROM generate_series(current_date - {{ lookback_days }}, current_date, interval '1 day') AS recent_date
+),
+
+{{ suffix }}_rebuild_dates AS (
+    SELECT DISTINCT changed_date + day_offset AS date_line
+    FROM {{ suffix }}_changed_dates
+    CROSS JOIN generate_series(-{{ fuzzy_match_days }}, {{ fuzzy_match_days }}) AS day_offset
+),
+{% endif %}
+
 -- Assignments with matching timesheets (direct or fuzzy match)
 -- Note: An assignment can have MULTIPLE timesheet entries (partial shifts, breaks, etc.)
 {{ suffix }}_assignment_timesheets AS (
@@ -78,7 +154,10 @@ WITH
             WHEN ts.time_id IS NULL THEN 'no_timesheet'
             WHEN stsa.id = ts.shift_assignment_id THEN 'direct_match'
             ELSE 'fuzzy_match'
-        END AS match_type
+        END AS match_type,
+
+        -- Newest source load of the row, the incremental watermark
+        GREATEST(stsa._dlt_load_id, ts._dlt_load_id) AS _source_load_id
 
     FROM {{ source(dataset, 'sched_template_shift_assignments') }} AS stsa
     INNER JOIN {{ source(dataset, 'users') }} AS users
@@ -106,6 +185,9 @@ WITH
         AND stsa.published = 'true'
         AND stsa.type = 'Regular'
         AND stsa.user_id IS NOT NULL
+        {% if incremental %}
+        AND stsa.date_line IN (SELECT date_line FROM {{ suffix }}_rebuild_dates)
+        {% endif %}
 ),
 
 -- Orphan timesheets: punches that don't match any assignment for that user
@@ -146,7 +228,9 @@ WITH
         ts.time_end_ts::bigint = 0 AS is_clocked_in,
         ts.time_end_ts::bigint != 0 AS is_clocked_out,
         FALSE AS has_assignment,
-        'orphan' AS match_type
+        'orphan' AS match_type,
+
+        ts._dlt_load_id AS _source_load_id
 
     FROM {{ source(dataset, 'timesheet') }} AS ts
     INNER JOIN {{ source(dataset, 'users') }} AS users
@@ -172,6 +256,10 @@ WITH
                 )
             )
     )
+    {% if incremental %}
+        AND (TO_TIMESTAMP(ts.time_start_ts) AT TIME ZONE '{{ local_tz }}')::date
+            IN (SELECT date_line FROM {{ suffix }}_rebuild_dates)
+    {% endif %}
 ),
 
 {{ suffix }}_combined AS (
@@ -0,0 +1,60 @@
+import logging
+import sqlite3
+
+import dlt
+import pytest
+
+from flows import hash_diff
+from flows.hash_diff import hash_diff_tables
+
+
+@pytest.fixture
+def source_db(tmp_path, monkeypatch):
+    path = tmp_path / "source.db"
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE unit_types (code TEXT, name TEXT)")
+        connection.executemany("INSERT INTO unit_types VALUES (?, ?)", [("ALS", "Advanced"), ("BLS", "Basic")])
+        connection.execute("CREATE TABLE units (id INTEGER PRIMARY KEY, name TEXT)")
+        connection.executemany("INSERT INTO units VALUES (?, ?)", [(1, "Medic 1"), (2, "Medic 2")])
+    monkeypatch.setenv("SOURCES__HASH_DIFF_TEST__CREDENTIALS", f"sqlite:///{path}")
+    monkeypatch.setattr(hash_diff, "get_run_logger", lambda: logging.getLogger(__name__))
+    return path
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setenv("RUNTIME__DLTHUB_TELEMETRY", "false")
+    return dlt.pipeline(
+        pipeline_name="hash_diff_test",
+        destination=dlt.destinations.duckdb(str(tmp_path / "warehouse.duckdb")),
+        dataset_name="hash_diff_test",
+        pipelines_dir=str(tmp_path / "pipelines"),
+    )
+
+
+def load_rows(pipeline, table_name):
+    with pipeline.sql_client() as client:
+        return sorted(client.execute_sql(f"SELECT code, name FROM {client.make_qualified_table_name(table_name)}"))
+
+
+def test_table_without_primary_key_is_replaced(source_db, pipeline, caplog):
+    with caplog.at_level(logging.WARNING):
+        resources, deleted = hash_diff_tables(pipeline, "hash_diff_test", "unit_types")
+
+    assert deleted == 0
+    assert [resource.write_disposition for resource in resources] == ["replace"]
+    assert "unit_types has no primary key" in caplog.text
+
+    pipeline.run(resources)
+    with sqlite3.connect(source_db) as connection:
+        connection.execute("UPDATE unit_types SET name = 'Basic Life Support' WHERE code = 'BLS'")
+    pipeline.run(hash_diff_tables(pipeline, "hash_diff_test", "unit_types")[0])
+
+    assert load_rows(pipeline, "unit_types") == [("ALS", "Advanced"), ("BLS", "Basic Life Support")]
+
+
+def test_table_with_primary_key_is_merged(source_db, pipeline):
+    resources, deleted = hash_diff_tables(pipeline, "hash_diff_test", "units")
+
+    assert deleted == 0
+    assert [resource.write_disposition for resource in resources] == ["merge"]
@@ -0,0 +1,77 @@
+import logging
+import os
+import time
+
+import pytest
+
+from flows import pipelines
+from flows.pipelines import get_pipeline, is_pipeline_in_use, prune_stale_pipelines
+
+
+@pytest.mark.parametrize(
+    "pipeline_name",
+    [
+        "cad_recent_traumasoft_tn",
+        "cad_recent_ref_traumasoft_mi",
+        "cad_weekly_ref_traumasoft_il",
+        "cad_monthly_20260101_traumasoft_tn",
+        "cad_backfill_20250106_traumasoft_il",
+        "chunk_checkpoints_traumasoft_mi",
+        "schedule_monthly_w1_traumasoft_tn",
+        "schedule_monthly_w5_traumasoft_il",
+        "schedule_monthly_timesheet_traumasoft_tn",
+        "bigquery_export_lan_analytics",
+        "bigquery_export_manifest_export_manifest",
+    ],
+)
+def test_current_pipeline_names_are_in_use(pipeline_name):
+    assert is_pipeline_in_use(pipeline_name)
+
+
+@pytest.mark.parametrize(
+    "pipeline_name",
+    [
+        # Previous time-stamped names
+        "cad_weekly_traumasoft_tn_1735689600",
+        "attachments_traumasoft_mi_1735689600",
+        "bigquery_export_1735689600",
+        # Previous chunk names with the date after the dataset
+        "cad_monthly_traumasoft_tn_20260101",
+        # Unregistered flows and datasets
+        "sql_to_postgres_traumasoft_tn",
+        "cad_recent_traumasoft_xx",
+    ],
+)
+def test_other_pipeline_names_are_stale(pipeline_name):
+    assert not is_pipeline_in_use(pipeline_name)
+
+
+def test_get_pipeline_rejects_unregistered_flow():
+    with pytest.raises(ValueError, match="PIPELINE_FLOWS"):
+        get_pipeline("cad_hourly", "traumasoft_tn")
+
+
+def test_prune_stale_pipelines_keeps_pipelines_in_use(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipelines, "_stale_pipelines_pruned", False)
+    monkeypatch.setattr(pipelines, "get_run_logger", lambda: logging.getLogger(__name__))
+    old = time.time() - pipelines.STALE_PIPELINE_MIN_AGE_SECONDS - 60
+    names = {
+        "cad_recent_traumasoft_tn": old,
+        "cad_monthly_20260101_traumasoft_tn": old,
+        "schedule_monthly_w2_traumasoft_mi": old,
+        "cad_weekly_traumasoft_tn_1735689600": old,
+        "cad_monthly_traumasoft_tn_20260101": old,
+        "attachments_traumasoft_mi_1735689600": time.time(),
+    }
+    for name, mtime in names.items():
+        (tmp_path / name).mkdir()
+        os.utime(tmp_path / name, (mtime, mtime))
+
+    prune_stale_pipelines(tmp_path)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "attachments_traumasoft_mi_1735689600",
+        "cad_monthly_20260101_traumasoft_tn",
+        "cad_recent_traumasoft_tn",
+        "schedule_monthly_w2_traumasoft_mi",
+    ]
@@ -0,0 +1,149 @@
+"""
+Generate included_columns for wide Traumasoft tables from dbt usage
+
+Reads the compiled dbt manifest (target/manifest.json) and catalog
+(target/catalog.json) and finds which columns of each Traumasoft source
+table are referenced by any model, snapshot or test that depends on it.
+The result, merged with KEEP_COLUMNS, is written to
+flows/included_columns.json, which source_table in flows/sources.py uses
+as the sql_table included_columns for those tables.
+
+Column usage is detected by parsing each node's compiled SQL with sqlglot
+and collecting every column identifier. Names are matched regardless of the
+table qualifier, so a column is kept if any dependent node mentions it,
+which over-includes but never drops a column in use. A node that selects
+* directly from the source table keeps every column of that table.
+
+Usage:
+    cd lan_dbt && dbt compile && dbt docs generate
+    python tools/generate_included_columns.py
+    python tools/generate_included_columns.py --tables cad_trip_legs_rev cad_trip_legs --dry-run
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from pathlib import Path
+
+import sqlglot
+from sqlglot import exp
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_TARGET_DIR = REPO_ROOT / "lan_dbt" / "target"
+OUTPUT_FILE = REPO_ROOT / "flows" / "included_columns.json"
+
+SOURCE_PREFIX = "traumasoft_"
+
+# Wide tables to project by default
+DEFAULT_TABLES = ["cad_trip_legs_rev", "cad_trip_legs"]
+
+# Columns kept on purpose even if no dbt model uses them: primary keys, the
+# cursor/date filter columns used by flows/cad_import.py, and columns read by
+# flows outside dbt.
+KEEP_COLUMNS = {
+    "cad_trip_legs_rev": ["leg_id", "rev", "modified", "leg_date"],
+    "cad_trip_legs": ["id", "rev", "created"],
+}
+
+
+def source_columns(catalog: dict, table_name: str) -> set[str]:
+    """Return every column of a Traumasoft source table from the dbt catalog."""
+    columns = set()
+    for unique_id, source in catalog.get("sources", {}).items():
+        source_name, name = unique_id.split(".")[-2:]
+        if name == table_name and source_name.startswith(SOURCE_PREFIX):
+            columns.update(column.lower() for column in source["columns"])
+    return columns
+
+
+def dependent_nodes(manifest: dict, table_name: str) -> list[dict]:
+    """Return compiled nodes that depend on the table in any Traumasoft source."""
+    nodes = []
+    for node in manifest["nodes"].values():
+        if node["resource_type"] not in ("model", "snapshot", "test"):
+            continue
+        for dependency in node.get("depends_on", {}).get("nodes", []):
+            if not dependency.startswith("source."):
+                continue
+            source_name, name = dependency.split(".")[-2:]
+            if name == table_name and source_name.startswith(SOURCE_PREFIX):
+                nodes.append(node)
+                break
+    return nodes
+
+
+def selects_star_from_table(tree: exp.Expression, table_name: str) -> bool:
+    """Check whether any SELECT reads * straight from the given table."""
+    for select in tree.find_all(exp.Select):
+        if not any(isinstance(projection, exp.Star) or (
+            isinstance(projection, exp.Column) and isinstance(projection.this, exp.Star)
+        ) for projection in select.expressions):
+            continue
+        from_tables = [
+            table for table in select.find_all(exp.Table)
+            if table.find_ancestor(exp.Select) is select
+        ]
+        if any(table.name.lower() == table_name for table in from_tables):
+            return True
+    return False
+
+
+def used_columns(manifest: dict, catalog: dict, table_name: str) -> list[str] | None:
+    """Return the columns of a table used by dbt, or None if all are needed."""
+    candidates = source_columns(catalog, table_name)
+    if not candidates:
+        raise ValueError(f"{table_name} not found in catalog.json, run 'dbt docs generate' first")
+
+    used = set()
+    for node in dependent_nodes(manifest, table_name):
+        compiled_sql = node.get("compiled_code")
+        if not compiled_sql:
+            raise ValueError(f"{node['unique_id']} has no compiled SQL, run 'dbt compile' first")
+
+        for tree in sqlglot.parse(compiled_sql, read="postgres"):
+            if tree is None:
+                continue
+            if selects_star_from_table(tree, table_name):
+                return None
+            used.update(column.name.lower() for column in tree.find_all(exp.Column))
+
+    return sorted((used & candidates) | set(KEEP_COLUMNS.get(table_name, [])))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-dir", type=Path, default=DEFAULT_TARGET_DIR)
+    parser.add_argument("--tables", nargs="+", default=DEFAULT_TABLES)
+    parser.add_argument("--output", type=Path, default=OUTPUT_FILE)
+    parser.add_argument("--dry-run", action="store_true", help="Print the result without writing it")
+    args = parser.parse_args()
+
+    manifest = json.loads((args.target_dir / "manifest.json").read_text())
+    catalog = json.loads((args.target_dir / "catalog.json").read_text())
+
+    included_columns = json.loads(args.output.read_text()) if args.output.exists() else {}
+    summary = defaultdict(str)
+    for table_name in args.tables:
+        columns = used_columns(manifest, catalog, table_name)
+        total = len(source_columns(catalog, table_name))
+        if columns is None:
+            included_columns.pop(table_name, None)
+            summary[table_name] = f"all {total} columns (selected with *)"
+        else:
+            included_columns[table_name] = columns
+            summary[table_name] = f"{len(columns)} of {total} columns"
+
+    for table_name, description in summary.items():
+        print(f"{table_name}: {description}")
+
+    output = json.dumps(included_columns, indent=2, sort_keys=True) + "\n"
+    if args.dry_run:
+        print(output)
+    else:
+        args.output.write_text(output)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()